@@ -0,0 +1,91 @@
+import time
+import random
+
+import fire
+
+import ptree
+
+CONFIG = {
+    'nonterminal_symbols': {'E': None},
+    'terminal_symbols': {
+        '+': r'\+',
+        '-': r'\-',
+        '*': r'\*',
+        '^': r'\^',
+        '(': r'\(',
+        ')': r'\)',
+        'num': '[0-9]+',
+    },
+    'ignored_symbols': None,
+    'start_symbol': 'E',
+    'precedence': [
+        {'left': ['+', '-']},
+        {'left': ['*']},
+        {'right': ['^']},
+    ],
+    'production_rules': [
+        'E -> E + E',
+        'E -> E - E',
+        'E -> E * E',
+        'E -> E ^ E',
+        'E -> ( E )',
+        'E -> num',
+    ],
+}
+
+
+def make_text(tokens: int, shape: str) -> str:
+    """
+    Flat texts are long sums, which keep the stack shallow. Deep texts are long chains of right associative powers,
+    which keep every operand on the stack until the end of the input.
+    """
+    count = (tokens + 1) // 2
+    if shape == 'flat':
+        rng = random.Random(0)
+        return str(rng.randint(0, 9)) + ''.join(f'{rng.choice("+-*")}{rng.randint(0, 9)}' for _ in range(count - 1))
+    if shape == 'deep':
+        return '^'.join(['1'] * count)
+    raise ValueError(f'unknown shape: {shape}')
+
+
+# Values are kept below 2 ** 32 so that long inputs do not turn into big integer arithmetic.
+HANDLERS = {
+    'E -> E + E': lambda nodes, _: (nodes[0] + nodes[2]) & 0xffffffff,
+    'E -> E - E': lambda nodes, _: (nodes[0] - nodes[2]) & 0xffffffff,
+    'E -> E * E': lambda nodes, _: (nodes[0] * nodes[2]) & 0xffffffff,
+    'E -> E ^ E': lambda nodes, _: pow(nodes[0], nodes[2], 1 << 32),
+    'E -> ( E )': lambda nodes, _: nodes[1],
+    'E -> num': lambda nodes, _: int(nodes[0]),
+}
+
+
+def main(tokens: int = 1000000, shape: str = 'flat', repeat: int = 3, stream: bool = False, translate: bool = False):
+    """
+    With --stream, tokens go straight from the lexer into the parser. With --translate, the expression is evaluated
+    by handlers during the parse instead of being turned into a tree.
+    """
+    grammar = ptree.Grammar(CONFIG)
+    grammar.init()
+    lexer = ptree.Lexer(CONFIG, symbol_pool=grammar.symbol_pool)
+    parser = ptree.Parser(grammar, handlers=HANDLERS if translate else None)
+    text = make_text(tokens, shape)
+
+    if stream:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            parser.parse(lexer.iter_tokens(text))
+            print(f'lexed and parsed {tokens} tokens ({shape}) in {time.perf_counter() - start:.2f}s')
+        return
+
+    start = time.perf_counter()
+    token_list = lexer.tokenize(text)
+    print(f'lexed {len(token_list)} tokens in {time.perf_counter() - start:.2f}s')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        parser.parse(token_list)
+        elapsed = time.perf_counter() - start
+        print(f'parsed {len(token_list)} tokens ({shape}) in {elapsed:.2f}s, {len(token_list) / elapsed:,.0f} tokens/s')
+
+
+if __name__ == '__main__':
+    fire.Fire(main)
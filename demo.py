@@ -3,14 +3,16 @@ import fire
 import ptree
 
 
-def main(config: str, text: str):
+def main(config: str, text: str, mode: str = ptree.ParseTable.MODE_LR1):
     config = ptree.load_config(config)
     grammar = ptree.Grammar(config)
-    grammar.init()
+    grammar.init(mode=mode)
 
     # Output 1: grammar
-    print('parse table:')
+    print(f'parse table ({mode}, {len(grammar.parse_table)} states):')
     ptree.pprint(grammar.parse_table)
+    for conflict in grammar.parse_table.conflicts:
+        print(conflict)
 
     lexer = ptree.Lexer(config=config, symbol_pool=grammar.symbol_pool)
     parser = ptree.Parser(grammar)
@@ -0,0 +1,56 @@
+import multiprocessing
+
+from typing import Any, Iterable, Iterator
+
+from ptree.lexer.lexer import Lexer
+from ptree.parser.grammar import Grammar
+from ptree.parser.parser import Parser, ParseTree
+
+_lexer = None
+_parser = None
+
+
+def _init_worker(lexer: Lexer, parser: Parser):
+    global _lexer, _parser
+    _lexer, _parser = lexer, parser
+
+
+def _parse(document: tuple[int, str]) -> tuple[int, ParseTree | ValueError]:
+    # A failed document is sent back as its exception, so that the pool keeps going and the error keeps its index.
+    index, document = document
+    try:
+        return index, _parser.parse(_lexer.tokenize(document))
+    except ValueError as e:
+        return index, e
+
+
+def parse_many(config: dict[str, Any],
+               documents: Iterable[str],
+               workers: int | None = None,
+               chunk_size: int = 64,
+               ordered: bool = True,
+               start_method: str | None = None,
+               errors: str = 'raise',
+               **lexer_options) -> Iterator[ParseTree | ValueError | tuple[int, ParseTree | ValueError]]:
+    """
+    Lexes and parses documents on a pool of worker processes. The grammar and the lexer tables are built once here
+    and handed to the workers, through fork where available or by pickling otherwise. Documents are sent in chunks.
+    The parse trees come back in the order of the documents, or as (index, parse tree) pairs as soon as they are
+    done if ordered is false. A document that fails to lex or parse raises a ValueError naming its index, or with
+    errors='return', its ValueError takes the place of its parse tree.
+    """
+    if errors not in {'raise', 'return'}:
+        raise ValueError(f'unknown errors option: {errors}')
+    grammar = Grammar(config)
+    grammar.init()
+    lexer = Lexer(config, symbol_pool=grammar.symbol_pool, **lexer_options).build()
+    context = multiprocessing.get_context(start_method)
+    with context.Pool(workers, initializer=_init_worker, initargs=(lexer, Parser(grammar))) as pool:
+        if ordered:
+            results = pool.imap(_parse, enumerate(documents), chunk_size)
+        else:
+            results = pool.imap_unordered(_parse, enumerate(documents), chunk_size)
+        for index, result in results:
+            if errors == 'raise' and isinstance(result, ValueError):
+                raise ValueError(f'document {index}: {result}') from result
+            yield result if ordered else (index, result)
@@ -0,0 +1,116 @@
+from ptree.lexer.lexer import Lexer
+
+_TEMPLATE = '''\
+"""
+Generated by ptree. Do not edit.
+"""
+import bisect
+
+WIDTH = {width}
+LOOKUP_SIZE = {lookup_size}
+TABLE = {table}
+ACCEPTS = {accepts}
+BOUNDS = {bounds}
+INTERVAL_CLASSES = {interval_classes}
+LOOKUP = {lookup}
+IGNORED_SYMBOLS = {ignored_symbols}
+
+
+class Terminal:
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __eq__(self, other: 'Terminal') -> bool:
+        if isinstance(other, Terminal):
+            return self.name == other.name
+        return False
+
+    def __hash__(self) -> int:
+        return hash(self.name)
+
+    def __str__(self) -> str:
+        return self.name
+
+    def __repr__(self) -> str:
+        return f'Terminal({{str(self)}})'
+
+
+class Token:
+
+    def __init__(self, value: str, symbol: Terminal, start: int | None = None, end: int | None = None):
+        self.value = value
+        self.symbol = symbol
+        self.start = start
+        self.end = end
+
+    def __eq__(self, other: 'Token') -> bool:
+        if isinstance(other, Token):
+            return self.value == other.value and self.symbol == other.symbol
+        return False
+
+    def __hash__(self) -> int:
+        return hash((self.value, self.symbol))
+
+    def __str__(self) -> str:
+        return self.value
+
+    def __repr__(self) -> str:
+        return f'Token({{str(self)}}, symbol={{repr(self.symbol)}})'
+
+
+TERMINALS = {{name: Terminal(name) for name in {terminals}}}
+
+
+def iter_tokens(text: str, start: int = 0):
+    table, accepts, lookup = TABLE, ACCEPTS, LOOKUP
+    i = start
+    while i < len(text):
+        state = 0
+        end_accept, end = None, i
+        for j in range(i, len(text)):
+            c = ord(text[j])
+            if c < LOOKUP_SIZE:
+                state = table[state * WIDTH + lookup[c]]
+            else:
+                state = table[state * WIDTH + INTERVAL_CLASSES[bisect.bisect_right(BOUNDS, c) - 1]]
+            if state < 0:
+                break
+            if accepts[state] is not None:
+                end_accept, end = accepts[state], j + 1
+        if end_accept is None:
+            raise ValueError(f'unexpected character: {{text[i]}} at index {{i}}')
+        if end_accept not in IGNORED_SYMBOLS:
+            yield Token(value=text[i:end], symbol=TERMINALS[end_accept], start=i, end=end)
+        i = end
+
+
+def tokenize(text: str) -> list[Token]:
+    return list(iter_tokens(text))
+'''
+
+
+def _format_list(values: list, per_line: int = 16) -> str:
+    if len(values) <= per_line:
+        return repr(values)
+    lines = [', '.join(map(repr, values[i:i + per_line])) for i in range(0, len(values), per_line)]
+    return '[\n' + ''.join(f'    {line},\n' for line in lines) + ']'
+
+
+def generate_source(lexer: Lexer) -> str:
+    """
+    Emits a standalone Python module that tokenizes like the given lexer. The module only depends on the standard
+    library and carries the compiled DFA of the lexer as literal tables.
+    """
+    compiled_dfa = lexer._compiled_dfa
+    return _TEMPLATE.format(
+        width=compiled_dfa.width,
+        lookup_size=len(compiled_dfa.lookup),
+        table=_format_list(compiled_dfa.table),
+        accepts=_format_list(compiled_dfa.accepts, per_line=8),
+        bounds=_format_list(compiled_dfa.bounds),
+        interval_classes=_format_list(compiled_dfa.interval_classes),
+        lookup=_format_list(compiled_dfa.lookup),
+        ignored_symbols=repr(set(lexer._ignored_symbols)),
+        terminals=_format_list(list(lexer._symbol_names_and_patterns), per_line=8),
+    )
@@ -1,4 +1,139 @@
-from typing import Callable, Self, Optional
+import os
+import sys
+import json
+import array
+import bisect
+import pathlib
+import functools
+import contextlib
+
+from typing import Callable, Self, Optional, Iterable
+
+
+class CharSet:
+    MAX_CODE = 0x10ffff
+
+    def __init__(self, ranges: Iterable[tuple[int, int]] = ()):
+        merged = []
+        for lo, hi in sorted(ranges):
+            if lo > hi:
+                continue
+            if merged and lo <= merged[-1][1] + 1:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], hi))
+            else:
+                merged.append((lo, hi))
+        self.ranges = tuple(merged)
+        self._starts = [lo for lo, _ in merged]
+
+    @classmethod
+    def from_char(cls, c: str) -> Self:
+        return cls([(ord(c), ord(c))])
+
+    @classmethod
+    def from_range(cls, first: str, last: str) -> Self:
+        return cls([(ord(first), ord(last))])
+
+    @staticmethod
+    def split(charsets: list['CharSet']) -> list[tuple[int, int, set[int]]]:
+        """
+        Cuts the code points covered by the given sets into disjoint intervals. Each interval is returned with the
+        indices of the sets that contain it.
+        """
+        events = {}
+        for i, charset in enumerate(charsets):
+            for lo, hi in charset.ranges:
+                events.setdefault(lo, []).append(i)
+                events.setdefault(hi + 1, []).append(~i)
+        intervals = []
+        active = set()
+        previous = None
+        for point in sorted(events):
+            if active:
+                intervals.append((previous, point - 1, set(active)))
+            for i in events[point]:
+                if i >= 0:
+                    active.add(i)
+                else:
+                    active.discard(~i)
+            previous = point
+        return intervals
+
+    @staticmethod
+    def classify(charsets: list['CharSet']) -> tuple[list[int], list[int], list[frozenset[int]]]:
+        """
+        Groups code points that belong to exactly the same given sets into classes. Returns the sorted interval
+        bounds, the class of each interval and, for each class, the indices of the sets it belongs to. Class 0 belongs
+        to none of them.
+        """
+        class_id_map = {frozenset(): 0}
+        bounds, interval_classes = [0], [0]
+        for lo, hi, ids in CharSet.split(charsets):
+            class_id = class_id_map.setdefault(frozenset(ids), len(class_id_map))
+            for bound, interval_class in [(lo, class_id), (hi + 1, 0)]:
+                if bounds[-1] == bound:
+                    bounds.pop()
+                    interval_classes.pop()
+                if interval_classes[-1:] != [interval_class]:
+                    bounds.append(bound)
+                    interval_classes.append(interval_class)
+        return bounds, interval_classes, list(class_id_map)
+
+    def __contains__(self, c: str) -> bool:
+        code = ord(c)
+        i = bisect.bisect_right(self._starts, code) - 1
+        return i >= 0 and code <= self.ranges[i][1]
+
+    def __or__(self, other: 'CharSet') -> 'CharSet':
+        return CharSet(self.ranges + other.ranges)
+
+    def __sub__(self, other: 'CharSet') -> 'CharSet':
+        ranges = []
+        for lo, hi in self.ranges:
+            for other_lo, other_hi in other.ranges:
+                if other_hi < lo or other_lo > hi:
+                    continue
+                if other_lo > lo:
+                    ranges.append((lo, other_lo - 1))
+                lo = other_hi + 1
+                if lo > hi:
+                    break
+            if lo <= hi:
+                ranges.append((lo, hi))
+        return CharSet(ranges)
+
+    def __and__(self, other: 'CharSet') -> 'CharSet':
+        ranges = []
+        for lo, hi in self.ranges:
+            for other_lo, other_hi in other.ranges:
+                if other_lo <= hi and lo <= other_hi:
+                    ranges.append((max(lo, other_lo), min(hi, other_hi)))
+        return CharSet(ranges)
+
+    def __bool__(self) -> bool:
+        return bool(self.ranges)
+
+    def __eq__(self, other: 'CharSet') -> bool:
+        if isinstance(other, CharSet):
+            return self.ranges == other.ranges
+        return False
+
+    def __hash__(self) -> int:
+        return hash(self.ranges)
+
+    @staticmethod
+    def _format(ranges: tuple[tuple[int, int], ...]) -> str:
+        return ''.join(chr(lo) if lo == hi else f'{chr(lo)}-{chr(hi)}' for lo, hi in ranges)
+
+    def __str__(self) -> str:
+        if len(self.ranges) == 1 and self.ranges[0][0] == self.ranges[0][1]:
+            return chr(self.ranges[0][0])
+        complement = NFA.CHARSET - self
+        if not self - NFA.CHARSET and len(complement.ranges) < len(self.ranges):
+            return f'[^{self._format(complement.ranges)}]' if complement else '.'
+        return f'[{self._format(self.ranges)}]'
+
+    def __repr__(self) -> str:
+        return f'CharSet({str(self)})'
 
 
 class FSMState:
@@ -7,32 +142,49 @@ class FSMState:
         self.transitions = {}
         self.accept_list = []
 
-    def add_transition(self, on: str, target: 'FSMState'):
+    def add_transition(self, on: str | CharSet, target: 'FSMState'):
+        if isinstance(on, str) and on != NFA.EPSILON:
+            on = CharSet.from_char(on)
         self.transitions.setdefault(on, set()).add(target)
 
     def get_one_target(self, on: str) -> Optional['FSMState']:
-        return next(iter(self.get_targets(on)), None)
+        if on == NFA.EPSILON:
+            return next(iter(self.get_targets(on)), None)
+        for label, targets in self.transitions.items():
+            if isinstance(label, CharSet) and on in label:
+                return next(iter(targets))
+        return None
 
     def get_targets(self, on: str) -> set['FSMState']:
-        return self.transitions.get(on, set())
+        if on == NFA.EPSILON:
+            return self.transitions.get(on, set())
+        targets = set()
+        for label, label_targets in self.transitions.items():
+            if isinstance(label, CharSet) and on in label:
+                targets |= label_targets
+        return targets
 
     def dfs(self,
             visited: list['FSMState'] | None = None,
             action: Callable[['FSMState'], None] = lambda _: None) -> list['FSMState']:
-        action(self)
         if visited is None:
             visited = []
-        visited.append(self)
-        for targets in self.transitions.values():
-            for target in targets:
-                if target not in visited:
-                    target.dfs(visited, action)
+        seen = set(visited)
+        stack = [self]
+        while stack:
+            state = stack.pop()
+            if state in seen:
+                continue
+            action(state)
+            seen.add(state)
+            visited.append(state)
+            stack.extend(reversed([target for targets in state.transitions.values() for target in targets]))
         return visited
 
 
 class NFA:
     EPSILON = '\0'
-    CHARSET = set(chr(i + 1) for i in range(128)) - {'\r', '\n'}
+    CHARSET = CharSet([(1, CharSet.MAX_CODE)]) - CharSet.from_char('\r') - CharSet.from_char('\n')
 
     def __init__(self, start: FSMState | None = None, end: set[FSMState] | None = None):
         self.start = start
@@ -48,66 +200,448 @@ class NFA:
             start.add_transition(NFA.EPSILON, nfa.start)
         return cls(start)
 
-    def to_dfa(self) -> 'DFA':
-        return DFA(self.start)
+    def to_dfa(self, lazy: bool = False, priority: list[str] | None = None) -> 'DFA | LazyDFA':
+        if lazy:
+            return LazyDFA(self.start, priority=priority)
+        return DFA(self.start, priority=priority)
+
+    def copy(self) -> 'NFA':
+        state_map = {state: FSMState() for state in self.start.dfs()}
+        for state, new_state in state_map.items():
+            new_state.accept_list = list(state.accept_list)
+            for on, targets in state.transitions.items():
+                for target in targets:
+                    new_state.add_transition(on, state_map[target])
+        return NFA(state_map[self.start], {state_map[state] for state in self.end if state in state_map})
 
 
 class DFA(NFA):
 
-    def __init__(self, start: FSMState | None = None):
+    def __init__(self, start: FSMState | None = None, priority: list[str] | None = None):
         super().__init__(start)
-        start_closure = self._get_closure({start})
-        self.start = FSMState()
-        self.start.accept_list = list({accept for nfa_state in start_closure for accept in nfa_state.accept_list})
-        state_map = {frozenset(start_closure): self.start}
-        state_queue = [start_closure]
+        nfa_states = start.dfs()
+        state_id_map = {state: i for i, state in enumerate(nfa_states)}
+        closures = self._get_closures(nfa_states, state_id_map)
+        edges = [
+            [(on, state_id_map[target]) for on, targets in state.transitions.items() if on != NFA.EPSILON
+             for target in targets]
+            for state in nfa_states
+        ]
+
+        # DFA states are keyed by the ids of the NFA states in their closure.
+        state_map = {}
+        state_queue = []
+
+        def get_state(closure: frozenset[int]) -> FSMState:
+            state = state_map.get(closure)
+            if state is None:
+                state = FSMState()
+                state.accept_list = list({accept for i in closure for accept in nfa_states[i].accept_list})
+                if priority is not None:
+                    state.accept_list.sort(key=priority.index)
+                state_map[closure] = state
+                state_queue.append((closure, state))
+            return state
+
+        self.start = get_state(closures[0])
         while state_queue:
-            closure = state_queue.pop()
-            dfa_state = state_map[frozenset(closure)]
-            for on in {on for nfa_state in closure for on in nfa_state.transitions if on != NFA.EPSILON}:
-                targets = set()
-                for nfa_state in closure:
-                    targets.update(nfa_state.get_targets(on))
-                target_closure = self._get_closure(targets)
-                if frozenset(target_closure) not in state_map:
-                    target_state = FSMState()
-                    target_state.accept_list = list(
-                        {accept for nfa_state in target_closure for accept in nfa_state.accept_list})
-                    state_map[frozenset(target_closure)] = target_state
-                    state_queue.append(target_closure)
-                else:
-                    target_state = state_map[frozenset(target_closure)]
-                dfa_state.add_transition(on, target_state)
+            closure, dfa_state = state_queue.pop()
+            closure_edges = [edge for i in closure for edge in edges[i]]
+            closure_ranges = {}
+            for lo, hi, edge_ids in CharSet.split([on for on, _ in closure_edges]):
+                target_closure = frozenset().union(*[closures[closure_edges[i][1]] for i in edge_ids])
+                closure_ranges.setdefault(target_closure, []).append((lo, hi))
+            for target_closure, ranges in closure_ranges.items():
+                dfa_state.add_transition(CharSet(ranges), get_state(target_closure))
 
     @staticmethod
-    def _get_closure(closure: set[FSMState]) -> set[FSMState]:
-        state_queue = list(closure)
-        while state_queue:
-            state = state_queue.pop()
-            for target in state.get_targets(NFA.EPSILON):
-                if target not in closure:
-                    closure.add(target)
-                    state_queue.append(target)
-        return closure
+    def _get_closures(states: list[FSMState], state_id_map: dict[FSMState, int]) -> list[frozenset[int]]:
+        """
+        Computes the epsilon closure of every NFA state once, as a set of state ids.
+        """
+        closures = []
+        for state in states:
+            closure = {state_id_map[state]}
+            state_queue = [state]
+            while state_queue:
+                for target in state_queue.pop().get_targets(NFA.EPSILON):
+                    if state_id_map[target] not in closure:
+                        closure.add(state_id_map[target])
+                        state_queue.append(target)
+            closures.append(frozenset(closure))
+        return closures
 
     @classmethod
     def union(cls, others: list['DFA']) -> Self:
         nfa = super().union(others)
         return cls(nfa.start)
 
-    def to_dfa(self) -> Self:
+    def to_dfa(self, lazy: bool = False, priority: list[str] | None = None) -> Self:
         return self
 
-    def match(self, text: str) -> tuple[str, int] | None:
+    def minimize(self) -> tuple[int, int]:
+        states = self.start.dfs()
+        state_id_map = {state: i for i, state in enumerate(states)}
+        edges = [
+            (on, state_id, state_id_map[next(iter(targets))])
+            for state_id, state in enumerate(states)
+            for on, targets in state.transitions.items()
+        ]
+        # Character sets differ from state to state, so they are cut into disjoint intervals shared by all states.
+        predecessors = [{} for _ in states]
+        for interval_id, (_, _, edge_ids) in enumerate(CharSet.split([on for on, _, _ in edges])):
+            for edge_id in edge_ids:
+                _, source_id, target_id = edges[edge_id]
+                predecessors[target_id].setdefault(interval_id, set()).add(source_id)
+
+        # Accept lists are compared as sequences so that states with different token priorities never merge.
+        blocks = {}
+        for state_id, state in enumerate(states):
+            blocks.setdefault(tuple(state.accept_list), set()).add(state_id)
+        partition = list(blocks.values())
+        block_of = [0] * len(states)
+        for block_id, block in enumerate(partition):
+            for state_id in block:
+                block_of[state_id] = block_id
+
+        pending = set(range(len(partition)))
+        while pending:
+            sources = {}
+            for state_id in partition[pending.pop()]:
+                for on, source_ids in predecessors[state_id].items():
+                    sources.setdefault(on, set()).update(source_ids)
+            for source_ids in sources.values():
+                touched = {}
+                for state_id in source_ids:
+                    touched.setdefault(block_of[state_id], set()).add(state_id)
+                for block_id, inside in touched.items():
+                    block = partition[block_id]
+                    if len(inside) == len(block):
+                        continue
+                    outside = block - inside
+                    large, small = (inside, outside) if len(inside) > len(outside) else (outside, inside)
+                    partition[block_id] = large
+                    partition.append(small)
+                    for state_id in small:
+                        block_of[state_id] = len(partition) - 1
+                    pending.add(len(partition) - 1)
+
+        new_states = [FSMState() for _ in partition]
+        for new_state, block in zip(new_states, partition):
+            state = states[next(iter(block))]
+            new_state.accept_list = list(state.accept_list)
+            target_labels = {}
+            for on, targets in state.transitions.items():
+                target_labels.setdefault(block_of[state_id_map[next(iter(targets))]], []).append(on)
+            for block_id, labels in target_labels.items():
+                new_state.add_transition(CharSet([r for label in labels for r in label.ranges]), new_states[block_id])
+        self.start = new_states[block_of[0]]
+        return len(states), len(partition)
+
+    def compile(self) -> 'CompiledDFA':
+        return CompiledDFA.from_dfa(self)
+
+    def scan(self, text: str, start: int = 0) -> tuple[str | None, int, int]:
         state = self.start
-        end_state, end_index = None, 0
-        for i, c in enumerate(text):
-            target = state.get_one_target(c)
+        end_accept, end_index = None, start
+        for i in range(start, len(text)):
+            target = state.get_one_target(text[i])
             if target is None:
-                break
+                return end_accept, end_index, i
             state = target
             if state.accept_list:
-                end_state, end_index = state, i + 1
-        if end_state is None:
+                end_accept, end_index = state.accept_list[0], i + 1
+        return end_accept, end_index, len(text)
+
+    def match(self, text: str, start: int = 0) -> tuple[str, int] | None:
+        end_accept, end_index, _ = self.scan(text, start)
+        if end_accept is None:
+            return None
+        return end_accept, end_index
+
+    def match_many(self, texts, offsets=None) -> tuple[list[str | None], 'numpy.ndarray']:
+        """
+        Compiles the DFA on every call, see CompiledDFA.match_many to match many batches.
+        """
+        return self.compile().match_many(texts, offsets)
+
+
+class CompiledDFA:
+    VERSION = 2
+    LOOKUP_SIZE = 256
+
+    def __init__(self,
+                 table: list[int],
+                 accepts: list[str | None],
+                 bounds: list[int],
+                 interval_classes: list[int]):
+        self.table = table
+        self.accepts = accepts
+        self.width = len(table) // len(accepts)
+        self.bounds = bounds
+        self.interval_classes = interval_classes
+        self.lookup = [
+            self.interval_classes[bisect.bisect_right(self.bounds, code) - 1]
+            for code in range(CompiledDFA.LOOKUP_SIZE)
+        ]
+
+    @classmethod
+    def from_dfa(cls, dfa: DFA) -> Self:
+        states = dfa.start.dfs()
+        state_id_map = {state: i for i, state in enumerate(states)}
+        edges = [
+            (on, state_id, state_id_map[next(iter(targets))])
+            for state_id, state in enumerate(states)
+            for on, targets in state.transitions.items()
+        ]
+
+        # Code points that behave the same in every state share a character class. Class 0 has no transitions.
+        bounds, interval_classes, class_edges = CharSet.classify([on for on, _, _ in edges])
+        width = len(class_edges)
+        table = [-1] * (len(states) * width)
+        for class_id, edge_ids in enumerate(class_edges):
+            for edge_id in edge_ids:
+                _, state_id, target_id = edges[edge_id]
+                table[state_id * width + class_id] = target_id
+        accepts = [state.accept_list[0] if state.accept_list else None for state in states]
+        return cls(table, accepts, bounds, interval_classes)
+
+    @classmethod
+    def load(cls, path: pathlib.Path | str) -> Self | None:
+        """
+        Returns None if the file is missing, damaged or written by another version, so that the caller rebuilds it.
+        """
+        try:
+            with open(path, 'rb') as f:
+                header = json.loads(f.readline())
+                if header['version'] != CompiledDFA.VERSION or header['byteorder'] != sys.byteorder:
+                    return None
+                arrays = []
+                for size in header['sizes']:
+                    values = array.array('i')
+                    values.frombytes(f.read(size * values.itemsize))
+                    if len(values) != size:
+                        return None
+                    arrays.append(values)
+            table, bounds, interval_classes = arrays
+            accepts = header['accepts']
+            if not accepts or len(table) % len(accepts) or len(bounds) != len(interval_classes):
+                return None
+            if not all(accept is None or isinstance(accept, str) for accept in accepts):
+                return None
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+        return cls(table.tolist(), accepts, bounds.tolist(), interval_classes.tolist())
+
+    def save(self, path: pathlib.Path | str):
+        """
+        Writes a JSON header line followed by the raw integer arrays. Nothing in the file is executed on load, so a
+        cache directory can be shared.
+        """
+        arrays = [array.array('i', self.table), array.array('i', self.bounds), array.array('i', self.interval_classes)]
+        header = {
+            'version': CompiledDFA.VERSION,
+            'byteorder': sys.byteorder,
+            'accepts': self.accepts,
+            'sizes': [len(values) for values in arrays],
+        }
+        path = pathlib.Path(path)
+        temp_path = path.with_name(f'{path.name}.{os.getpid()}.tmp')
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with open(temp_path, 'wb') as f:
+                f.write(json.dumps(header).encode() + b'\n')
+                for values in arrays:
+                    f.write(values.tobytes())
+            os.replace(temp_path, path)
+        except OSError:
+            with contextlib.suppress(OSError):
+                temp_path.unlink()
+            raise
+
+    def __len__(self) -> int:
+        return len(self.accepts)
+
+    def scan(self, text: str, start: int = 0) -> tuple[str | None, int, int]:
+        table, width, accepts, lookup = self.table, self.width, self.accepts, self.lookup
+        bounds, interval_classes = self.bounds, self.interval_classes
+        state = 0
+        end_accept, end_index = None, start
+        for i in range(start, len(text)):
+            c = ord(text[i])
+            if c < CompiledDFA.LOOKUP_SIZE:
+                state = table[state * width + lookup[c]]
+            else:
+                state = table[state * width + interval_classes[bisect.bisect_right(bounds, c) - 1]]
+            if state < 0:
+                return end_accept, end_index, i
+            if accepts[state] is not None:
+                end_accept, end_index = accepts[state], i + 1
+        return end_accept, end_index, len(text)
+
+    def match(self, text: str, start: int = 0) -> tuple[str, int] | None:
+        end_accept, end_index, _ = self.scan(text, start)
+        if end_accept is None:
+            return None
+        return end_accept, end_index
+
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        state.pop('_arrays', None)
+        return state
+
+    @functools.cached_property
+    def _arrays(self) -> tuple['numpy.ndarray', 'numpy.ndarray', 'numpy.ndarray']:
+        import numpy as np
+        # One entry per code point is a few megabytes, but indexing it is much faster than a binary search.
+        class_lookup = np.repeat(
+            np.asarray(self.interval_classes, dtype=np.int32),
+            np.diff(np.asarray(self.bounds + [CharSet.MAX_CODE + 1])),
+        )
+        table = np.asarray(self.table, dtype=np.int32).reshape(-1, self.width)
+        accepting = np.array([accept is not None for accept in self.accepts])
+        return class_lookup, table, accepting
+
+    def match_many(self, texts, offsets=None) -> tuple[list[str | None], 'numpy.ndarray']:
+        """
+        Matches the start of many strings at once. The strings are given as a sequence, as a matrix of code points
+        padded with zeros, or as one buffer of code points, or a str, with the offsets where each string starts
+        followed by where the last one ends. They are advanced through the transition table in lock-step with NumPy.
+        Returns the accepted symbol of each string, None if there is no match, and the length of each match. The
+        NumPy tables are built on the first call and kept for the next ones.
+        """
+        import numpy as np
+        if offsets is None:
+            codes = np.asarray(texts)
+            if codes.ndim == 1 and not len(codes):
+                return [], np.zeros(0, dtype=np.int64)
+            if codes.dtype.kind == 'U' and codes.ndim == 1:
+                codes = codes.view(np.uint32).reshape(len(codes), -1)
+            if codes.ndim != 2 or codes.dtype.kind not in 'iu':
+                raise ValueError(
+                    f'expected strings or a matrix of code points, got {codes.dtype} of shape {codes.shape}',
+                )
+            count, width = codes.shape
+        else:
+            if isinstance(texts, str):
+                codes = np.frombuffer(texts.encode('utf-32-le', 'surrogatepass'), dtype=np.uint32)
+            else:
+                codes = np.asarray(texts)
+            offsets = np.asarray(offsets)
+            if codes.ndim != 1 or codes.dtype.kind not in 'iu' and codes.size:
+                raise ValueError(f'expected a buffer of code points, got {codes.dtype} of shape {codes.shape}')
+            if offsets.ndim != 1 or not len(offsets) or offsets.dtype.kind not in 'iu':
+                raise ValueError(f'expected offsets as integers, got {offsets.dtype} of shape {offsets.shape}')
+            starts, string_lengths = offsets[:-1].astype(np.int64), np.diff(offsets.astype(np.int64))
+            if offsets[0] < 0 or offsets[-1] > len(codes) or (string_lengths < 0).any():
+                raise ValueError('offsets must be increasing and within the buffer')
+            count, width = len(starts), int(string_lengths.max(initial=0))
+        if codes.size and (codes.min() < 0 or codes.max() > CharSet.MAX_CODE):
+            raise ValueError(f'code points must be between 0 and {CharSet.MAX_CODE}')
+        class_lookup, table, accepting = self._arrays
+        states = np.zeros(count, dtype=np.int32)
+        end_states = np.full(count, -1, dtype=np.int32)
+        lengths = np.zeros(count, dtype=np.int64)
+        rows = np.arange(count)
+        for i in range(width):
+            if offsets is None:
+                column = codes[rows, i]
+            else:
+                # Strings end at their own length instead of at padding.
+                running = string_lengths[rows] > i
+                rows, states = rows[running], states[running]
+                column = codes[starts[rows] + i]
+            states = table[states, class_lookup[column]]
+            alive = states >= 0
+            rows, states = rows[alive], states[alive]
+            if not len(rows):
+                break
+            accepted = accepting[states]
+            end_states[rows[accepted]] = states[accepted]
+            lengths[rows[accepted]] = i + 1
+        accepts = [None if state < 0 else self.accepts[state] for state in end_states.tolist()]
+        return accepts, lengths
+
+
+class LazyDFA:
+    CACHE_SIZE = 4096
+    MAX_FLUSHES = 16
+
+    def __init__(self, start: FSMState, priority: list[str] | None = None, cache_size: int = CACHE_SIZE):
+        nfa_states = start.dfs()
+        state_id_map = {state: i for i, state in enumerate(nfa_states)}
+        edges = [
+            (on, state_id, state_id_map[target])
+            for state_id, state in enumerate(nfa_states)
+            for on, targets in state.transitions.items()
+            if on != NFA.EPSILON
+            for target in targets
+        ]
+        self.bounds, self.interval_classes, class_edges = CharSet.classify([on for on, _, _ in edges])
+        self.lookup = [
+            self.interval_classes[bisect.bisect_right(self.bounds, code) - 1]
+            for code in range(CompiledDFA.LOOKUP_SIZE)
+        ]
+        self._closures = DFA._get_closures(nfa_states, state_id_map)
+        self._steps = [{} for _ in nfa_states]
+        for class_id, edge_ids in enumerate(class_edges):
+            for edge_id in edge_ids:
+                _, state_id, target_id = edges[edge_id]
+                self._steps[state_id].setdefault(class_id, []).append(self._closures[target_id])
+        self._rank = {name: i for i, name in enumerate(priority or [])}
+        self._accepts = [min(state.accept_list, key=self._get_rank, default=None) for state in nfa_states]
+        self._start = self._closures[0]
+        self._cache_size = cache_size
+        self._states = {}
+        self.flush_count = 0
+
+    def __len__(self) -> int:
+        return len(self._states)
+
+    def _get_rank(self, name: str) -> int:
+        return self._rank.get(name, len(self._rank))
+
+    def _get_state(self, closure: frozenset[int]) -> tuple[str | None, dict[int, frozenset[int] | None]]:
+        state = self._states.get(closure)
+        if state is None:
+            accepts = [self._accepts[i] for i in closure if self._accepts[i] is not None]
+            state = min(accepts, key=self._get_rank, default=None), {}
+            # Once the cache has been flushed too often, states are only simulated and never stored.
+            if self.flush_count < LazyDFA.MAX_FLUSHES:
+                if len(self._states) >= self._cache_size:
+                    self._states.clear()
+                    self.flush_count += 1
+                self._states[closure] = state
+        return state
+
+    def _step(self, closure: frozenset[int], class_id: int) -> frozenset[int] | None:
+        targets = [target for i in closure for target in self._steps[i].get(class_id, ())]
+        return frozenset().union(*targets) if targets else None
+
+    def scan(self, text: str, start: int = 0) -> tuple[str | None, int, int]:
+        lookup, bounds, interval_classes = self.lookup, self.bounds, self.interval_classes
+        closure = self._start
+        _, transitions = self._get_state(closure)
+        end_accept, end_index = None, start
+        for i in range(start, len(text)):
+            c = ord(text[i])
+            if c < CompiledDFA.LOOKUP_SIZE:
+                class_id = lookup[c]
+            else:
+                class_id = interval_classes[bisect.bisect_right(bounds, c) - 1]
+            if class_id in transitions:
+                closure = transitions[class_id]
+            else:
+                closure = transitions[class_id] = self._step(closure, class_id)
+            if closure is None:
+                return end_accept, end_index, i
+            accept, transitions = self._get_state(closure)
+            if accept is not None:
+                end_accept, end_index = accept, i + 1
+        return end_accept, end_index, len(text)
+
+    def match(self, text: str, start: int = 0) -> tuple[str, int] | None:
+        end_accept, end_index, _ = self.scan(text, start)
+        if end_accept is None:
             return None
-        return end_state.accept_list[0], end_index
+        return end_accept, end_index
@@ -1,39 +1,238 @@
-from typing import Any
+import codecs
+import contextlib
+import functools
+import hashlib
+import json
+import mmap
+import pathlib
+
+from typing import Any, Iterator, IO, Self
 
 from ptree.symbol.symbol import Token
 from ptree.symbol.pool import SymbolPool
-from ptree.lexer.fsm import NFA
-from ptree.lexer.regex import Regex, RegexEngine
+from ptree.lexer.fsm import NFA, DFA, CompiledDFA, LazyDFA
+from ptree.lexer.regex import Regex, RegexEngine, RegexSet
+from ptree.lexer.stream import TokenStream, TokenBuffer
 
 
 class Lexer:
+    BACKEND_DFA = 'dfa'
+    BACKEND_COMPILED = 'compiled'
+    BACKEND_LAZY = 'lazy'
+    BACKEND_RE = 're'
 
-    def __init__(self, config: dict[str, Any], symbol_pool: SymbolPool):
+    def __init__(self,
+                 config: dict[str, Any],
+                 symbol_pool: SymbolPool,
+                 backend: str = BACKEND_COMPILED,
+                 cache_dir: pathlib.Path | str | None = None):
+        if backend not in {Lexer.BACKEND_DFA, Lexer.BACKEND_COMPILED, Lexer.BACKEND_LAZY, Lexer.BACKEND_RE}:
+            raise ValueError(f'unknown lexer backend: {backend}')
         self._config = config
         self._symbol_pool = symbol_pool
+        self._backend = backend
+        self._cache_dir = None if cache_dir is None else pathlib.Path(cache_dir)
         self._symbol_names_and_patterns = self._config['terminal_symbols'] or {}
         self._ignored_symbols = self._config['ignored_symbols'] or []
-        engine = RegexEngine()
+
+    def __getstate__(self) -> dict[str, Any]:
+        # Only the compact matchers are shipped. The automata behind them are object graphs that are slow to pickle,
+        # so a DFA is replaced by its compiled tables, which match the same way.
+        state = self.__dict__.copy()
+        for name in ['_nfa', '_dfa']:
+            state.pop(name, None)
+        if isinstance(state.get('_matcher'), DFA):
+            state['_matcher'] = state['_compiled_dfa'] = self._compiled_dfa
+        return state
+
+    @functools.cached_property
+    def _nfa(self) -> NFA:
+        engine = RegexEngine.shared()
         nfa_list = [
-            engine.parse(Regex(name, pattern)) for name, pattern in self._symbol_names_and_patterns.items()
+            engine.compile(Regex(name, pattern)) for name, pattern in self._symbol_names_and_patterns.items()
         ]
-        self._dfa = NFA.union(nfa_list).to_dfa()
-        self._dfa.start.dfs(
-            action=lambda state: state.accept_list.sort(
-                key=lambda x: list(self._symbol_names_and_patterns).index(x),
-            ),
-        )
+        return NFA.union(nfa_list)
+
+    @functools.cached_property
+    def _dfa(self) -> DFA:
+        dfa = self._nfa.to_dfa(priority=list(self._symbol_names_and_patterns))
+        dfa.minimize()
+        return dfa
+
+    @functools.cached_property
+    def _compiled_dfa(self) -> CompiledDFA:
+        if self._cache_dir is None:
+            return self._dfa.compile()
+        key = hashlib.sha256(json.dumps([
+            CompiledDFA.VERSION,
+            list(self._symbol_names_and_patterns.items()),
+        ]).encode()).hexdigest()
+        path = self._cache_dir / f'lexer-{key}.bin'
+        compiled_dfa = CompiledDFA.load(path)
+        if compiled_dfa is None:
+            compiled_dfa = self._dfa.compile()
+            # An unwritable cache directory only costs a rebuild next time.
+            with contextlib.suppress(OSError):
+                compiled_dfa.save(path)
+        return compiled_dfa
+
+    @functools.cached_property
+    def _matcher(self) -> DFA | CompiledDFA | LazyDFA | RegexSet:
+        if self._backend == Lexer.BACKEND_COMPILED:
+            return self._compiled_dfa
+        if self._backend == Lexer.BACKEND_RE:
+            return RegexSet([Regex(name, pattern) for name, pattern in self._symbol_names_and_patterns.items()])
+        if self._backend == Lexer.BACKEND_LAZY:
+            return self._nfa.to_dfa(lazy=True, priority=list(self._symbol_names_and_patterns))
+        return self._dfa
+
+    def build(self) -> Self:
+        """
+        Builds the matching tables up front instead of on the first call to tokenize or relex.
+        """
+        _ = self._matcher
+        return self
+
+    def iter_tokens(self, text: str, start: int = 0) -> Iterator[Token]:
+        """
+        The stop of a token is the furthest index examined by its own scan and by the scans of the ignored symbols
+        right before it.
+        """
+        i, stop = start, -1
+        while i < len(text):
+            symbol_name, end, scan_stop = self._matcher.scan(text, i)
+            if symbol_name is None:
+                raise ValueError(f'unexpected character: {text[i]} at index {i}')
+            stop = max(stop, scan_stop)
+            if symbol_name not in self._ignored_symbols:
+                yield Token(
+                    value=text[i:end],
+                    symbol=self._symbol_pool.get_terminal(symbol_name),
+                    start=i,
+                    end=end,
+                    stop=stop,
+                )
+                stop = -1
+            i = end
 
     def tokenize(self, text: str) -> list[Token]:
-        result = []
-        while text:
-            match self._dfa.match(text):
-                case None:
-                    raise ValueError(f'unexpected character: {text[0]}')
-                case (symbol_name, matched_idx):
-                    if symbol_name not in self._ignored_symbols:
-                        result.append(
-                            Token(value=text[:matched_idx], symbol=self._symbol_pool.get_terminal(symbol_name))
-                        )
-                    text = text[matched_idx:]
-        return result
+        return list(self.iter_tokens(text))
+
+    def tokenize_stream(self, text: str) -> TokenStream:
+        """
+        Same as tokenize, but the tokens are kept in a compact TokenStream instead of a list of Token objects.
+        """
+        names = list(self._symbol_names_and_patterns)
+        symbol_ids = {name: i for i, name in enumerate(names) if name not in self._ignored_symbols}
+        tokens = TokenStream(text, [self._symbol_pool.get_terminal(name) for name in names])
+        scan = self._matcher.scan
+        i = 0
+        while i < len(text):
+            symbol_name, end, _ = scan(text, i)
+            if symbol_name is None:
+                raise ValueError(f'unexpected character: {text[i]} at index {i}')
+            if symbol_name in symbol_ids:
+                tokens.append(symbol_ids[symbol_name], i, end)
+            i = end
+        return tokens
+
+    def relex(self,
+              text: str,
+              tokens: list[Token] | TokenBuffer,
+              start: int,
+              old_length: int,
+              new_text: str) -> tuple[TokenBuffer, int, int, int]:
+        """
+        Updates the tokens of a text after old_length characters at start were replaced by new_text. The given text is
+        the edited one. Scanning restarts at the first token whose scans looked at the edited range and stops as soon
+        as a token starts where an old token, shifted by the edit, used to start. A TokenBuffer is updated in place,
+        and a list is first copied into one. Returns the buffer and the range that changed: tokens[first:old_end] of
+        the old tokens were replaced by tokens[first:new_end] of the new ones.
+        """
+        if not isinstance(tokens, TokenBuffer):
+            tokens = TokenBuffer(tokens)
+        delta = len(new_text) - old_length
+        # Tokens starting before the edit are only rescanned if their scans reached it. No scan looked further ahead
+        # than the lookahead of the buffer, so the search stops at tokens whose scans started before that.
+        first = tokens.find(start)
+        for k in range(first - 1, -1, -1):
+            if k > 0 and tokens[k - 1].end < start - tokens.lookahead:
+                break
+            if tokens[k].stop >= start:
+                first = k
+        i = origin = tokens[first - 1].end if first > 0 else 0
+        stop, lookahead = -1, 0
+        old_end = first
+        new_tokens = []
+        while i < len(text):
+            symbol_name, end, scan_stop = self._matcher.scan(text, i)
+            if symbol_name is None:
+                raise ValueError(f'unexpected character: {text[i]} at index {i}')
+            stop = max(stop, scan_stop)
+            if symbol_name not in self._ignored_symbols:
+                if i >= start + len(new_text):
+                    while old_end < len(tokens) and tokens[old_end].start + delta < i:
+                        old_end += 1
+                    if old_end < len(tokens) and tokens[old_end].start + delta == i:
+                        break
+                new_tokens.append(Token(
+                    value=text[i:end],
+                    symbol=self._symbol_pool.get_terminal(symbol_name),
+                    start=i,
+                    end=end,
+                    stop=stop,
+                ))
+                lookahead = max(lookahead, stop - origin)
+                stop, origin = -1, end
+            i = end
+        else:
+            old_end = len(tokens)
+        new_end = first + len(new_tokens)
+        if old_end < len(tokens):
+            # The ignored symbols before the first reused token may have changed, so its stop comes from the rescan.
+            token = tokens[old_end]
+            new_tokens.append(Token(
+                value=token.value,
+                symbol=token.symbol,
+                start=token.start + delta,
+                end=token.end + delta,
+                stop=stop,
+            ))
+            lookahead = max(lookahead, stop - origin)
+            tokens.replace(first, old_end + 1, new_tokens, delta, lookahead)
+        else:
+            tokens.replace(first, old_end, new_tokens, delta, lookahead)
+        return tokens, first, old_end, new_end
+
+    def iter_stream(self,
+                    stream: IO | mmap.mmap,
+                    chunk_size: int = 1 << 16,
+                    encoding: str = 'utf-8') -> Iterator[Token]:
+        decoder = codecs.getincrementaldecoder(encoding)()
+        buffer, offset, i = '', 0, 0
+        furthest = -1
+        eof = False
+        while not eof:
+            chunk = stream.read(chunk_size)
+            eof = not chunk
+            if isinstance(chunk, bytes):
+                chunk = decoder.decode(chunk, final=eof)
+            buffer, offset, i = buffer[i:] + chunk, offset + i, 0
+            while i < len(buffer):
+                symbol_name, end, stop = self._matcher.scan(buffer, i)
+                # A scan that ran off the end of the buffer may still grow once the next chunk arrives.
+                if stop == len(buffer) and not eof:
+                    break
+                if symbol_name is None:
+                    raise ValueError(f'unexpected character: {buffer[i]} at index {offset + i}')
+                furthest = max(furthest, offset + stop)
+                if symbol_name not in self._ignored_symbols:
+                    yield Token(
+                        value=buffer[i:end],
+                        symbol=self._symbol_pool.get_terminal(symbol_name),
+                        start=offset + i,
+                        end=offset + end,
+                        stop=furthest,
+                    )
+                    furthest = -1
+                i = end
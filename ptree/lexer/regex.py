@@ -1,6 +1,14 @@
+import bisect
+import collections
+import functools
+import operator
+import re
+
+from typing import Any, Callable, Self
+
 from ptree.symbol.symbol import Token
 from ptree.symbol.pool import SymbolPool
-from ptree.lexer.fsm import FSMState, NFA
+from ptree.lexer.fsm import CharSet, FSMState, NFA
 from ptree.parser.grammar import ProductionRule, Transition, Grammar
 
 
@@ -51,8 +59,11 @@ class RegexEngine:
     TERMINALS = {'|', '(', ')', '*', '+', '[', ']', '-', 'char', '^', '.'}
     NONTERMINALS = {'E', 'T', 'F', 'P', 'Px'}
     START_SYMBOL_NAME = 'E'
+    CACHE_SIZE = 256
 
-    def __init__(self):
+    _shared = None
+
+    def __init__(self, cache_size: int = CACHE_SIZE):
         self._grammar = Grammar({
             'terminal_symbols': self.TERMINALS,
             'nonterminal_symbols': self.NONTERMINALS,
@@ -75,12 +86,75 @@ class RegexEngine:
             'F -> [ Px ]': self._handler_3,
             'F -> [ ^ Px ]': self._handler_10,
         }
-        rules = []
-        for rule_str, handler in self.handlers.items():
+        self.translators = {
+            'E -> E | T': lambda nodes, _: nodes[0] + [nodes[2]],
+            'E -> T': lambda nodes, _: [nodes[0]],
+            'T -> T F': self._translator_2,
+            'T -> F': lambda nodes, _: nodes[0],
+            'F -> ( E )': self._translator_3,
+            'F -> F *': self._translator_4,
+            'F -> F +': self._translator_4,
+            'F -> P': lambda nodes, _: _translate_charset(nodes[0]),
+            'P -> .': lambda *_: NFA.CHARSET,
+            'P -> char': lambda _, children: CharSet.from_char(children[0].value),
+            'P -> char - char': lambda _, children: CharSet.from_range(children[0].value, children[2].value),
+            'Px -> Px P': lambda nodes, _: nodes[0] | nodes[1],
+            'Px -> P': lambda nodes, _: nodes[0],
+            'F -> [ Px ]': lambda nodes, _: _translate_charset(nodes[1]),
+            'F -> [ ^ Px ]': lambda nodes, _: _translate_charset(NFA.CHARSET - nodes[2]),
+        }
+        self._rules = []
+        for rule_id, (rule_str, handler) in enumerate(self.handlers.items()):
             rule = ProductionRule.from_string(rule_str, self._grammar.symbol_pool)
+            rule.id = rule_id
             rule.handler = handler
-            rules.append(rule)
-        self._grammar.init(rules)
+            self._rules.append(rule)
+        self._transitions = []
+        for state, row in enumerate(_PARSE_TABLE):
+            self._transitions.append({})
+            for name, (transition_type, target) in row.items():
+                symbol = self._grammar.symbol_pool.get_symbol(name)
+                if transition_type in {Transition.TYPE_REDUCE, Transition.TYPE_ACCEPT}:
+                    target = self._rules[target]
+                self._transitions[state][symbol] = Transition(
+                    source=state,
+                    target=target,
+                    symbol=symbol,
+                    transition_type=transition_type,
+                )
+        self._cache_size = cache_size
+        self._cache = collections.OrderedDict()
+
+    @classmethod
+    def shared(cls) -> Self:
+        if cls._shared is None:
+            cls._shared = cls()
+        return cls._shared
+
+    def compute_parse_table(self) -> list[dict[str, tuple[int, int]]]:
+        """
+        Builds the LR(1) table of the regex grammar from scratch and numbers its states in breadth-first order over
+        sorted symbol names, which yields the static table stored in this module.
+        """
+        grammar = Grammar(self._grammar._config)
+        grammar.init([ProductionRule.from_string(rule_str, grammar.symbol_pool) for rule_str in self.handlers])
+        transitions = grammar.parse_table.transitions
+        state_id_map = {0: 0}
+        state_queue = collections.deque([0])
+        table = []
+        while state_queue:
+            state = state_queue.popleft()
+            row = {}
+            for symbol, transition in sorted(transitions[state].items(), key=lambda x: x[0].name):
+                if transition.type in {Transition.TYPE_SHIFT, Transition.TYPE_GOTO}:
+                    if transition.target not in state_id_map:
+                        state_id_map[transition.target] = len(state_id_map)
+                        state_queue.append(transition.target)
+                    row[symbol.name] = (transition.type, state_id_map[transition.target])
+                else:
+                    row[symbol.name] = (transition.type, transition.target.id)
+            table.append(row)
+        return table
 
     @staticmethod
     def _handler_0(nodes: list[NFA], _) -> NFA:
@@ -161,8 +235,7 @@ class RegexEngine:
         P -> .
         """
         start = FSMState()
-        for char in NFA.CHARSET:
-            start.add_transition(char, nodes[0].start)
+        start.add_transition(NFA.CHARSET, nodes[0].start)
         nfa = NFA(start)
         nfa.end = nodes[0].end
         return nfa
@@ -184,8 +257,7 @@ class RegexEngine:
         P -> char - char
         """
         start = FSMState()
-        for char in range(ord(children[0].value), ord(children[2].value) + 1):
-            start.add_transition(chr(char), nodes[0].start)
+        start.add_transition(CharSet.from_range(children[0].value, children[2].value), nodes[0].start)
         nfa = NFA(start)
         nfa.end = nodes[0].end
         return nfa
@@ -195,15 +267,12 @@ class RegexEngine:
         """
         Px -> Px P
         """
-        start, end = FSMState(), FSMState()
-        start.add_transition(NFA.EPSILON, nodes[0].start)
-        start.add_transition(NFA.EPSILON, nodes[1].start)
-        for state in nodes[0].end:
-            state.add_transition(NFA.EPSILON, end)
-        for state in nodes[1].end:
-            state.add_transition(NFA.EPSILON, end)
+        (on_0, targets), = nodes[0].start.transitions.items()
+        (on_1, _), = nodes[1].start.transitions.items()
+        start = FSMState()
+        start.add_transition(on_0 | on_1, next(iter(targets)))
         nfa = NFA(start)
-        nfa.end.add(end)
+        nfa.end = nodes[0].end
         return nfa
 
     @staticmethod
@@ -211,15 +280,80 @@ class RegexEngine:
         """
         F -> [ ^ Px ]
         """
+        (on, targets), = nodes[2].start.transitions.items()
         start = FSMState()
-        for char in NFA.CHARSET - nodes[2].start.transitions.keys():
-            start.add_transition(char, next(iter(next(iter(nodes[2].start.transitions.values())))))
+        start.add_transition(NFA.CHARSET - on, next(iter(targets)))
         nfa = NFA(start)
         nfa.end = nodes[2].end
         return nfa
 
-    def parse(self, regex: Regex) -> NFA:
-        parse_table = self._grammar.parse_table
+    # A translated node is a tuple of its pattern, the characters a match can start with, whether it matches the empty
+    # string, the characters it can still consume after it could have ended, and whether the first match re finds
+    # for it is also the longest. The last one holds for patterns in which the next character always decides which
+    # part of the pattern consumes it, and whose nested alternatives are not nullable except for the last one. For
+    # such patterns, the last item is a pattern whose match runs as far as a DFA would look ahead: the longest prefix
+    # of any match of the node.
+
+    @staticmethod
+    def _translator_2(nodes: list[tuple], _) -> tuple[str, CharSet, bool, CharSet, bool, str]:
+        """
+        T -> T F
+        """
+        (pattern_0, first_0, nullable_0, tail_0, longest_0, prefix_0), (pattern_1, first_1, nullable_1, tail_1,
+                                                                        longest_1, prefix_1) = nodes
+        longest = longest_0 and longest_1 and not tail_0 & first_1 and not (nullable_0 and first_0 & first_1)
+        # The left side is done once the next character can only start the right side.
+        return (
+            pattern_0 + pattern_1,
+            first_0 | first_1 if nullable_0 else first_0,
+            nullable_0 and nullable_1,
+            tail_1 | tail_0 | first_1 if nullable_1 else tail_1,
+            longest,
+            f'(?:(?>{pattern_0})(?={_charset_to_pattern(first_1)}){prefix_1}|{prefix_0})',
+        )
+
+    @staticmethod
+    def _translator_3(nodes: list, _) -> tuple[str, CharSet, bool, CharSet, bool, str]:
+        """
+        F -> ( E )
+        """
+        patterns, firsts, nullables, tails, longests, prefixes = zip(*nodes[1])
+        # re takes the first alternative that leads to a match, so an empty match must not come before a longer one.
+        longest = all(longests) and not any(nullables[:-1])
+        first = CharSet()
+        for first_ in firsts:
+            longest = longest and not first & first_
+            first |= first_
+        prefix = '|'.join(f'(?={_charset_to_pattern(first_)}){prefix}' for first_, prefix in zip(firsts, prefixes))
+        return (
+            f'(?:{"|".join(patterns)})',
+            first,
+            any(nullables),
+            functools.reduce(operator.or_, tails),
+            longest,
+            f'(?:{prefix}|)',
+        )
+
+    @staticmethod
+    def _translator_4(nodes: list[tuple], children: list[Token]) -> tuple[str, CharSet, bool, CharSet, bool, str]:
+        """
+        F -> F *;
+        F -> F +;
+        """
+        pattern, first, nullable, tail, longest, prefix = nodes[0]
+        # Python reads a quantifier after a quantifier as possessive or as an error, so the operand gets a group.
+        if pattern.endswith(('*', '+')):
+            pattern = f'(?:{pattern})'
+        return (
+            pattern + children[1].value,
+            first,
+            nullable or children[1].value == '*',
+            tail | first,
+            longest and not tail & first,
+            f'(?:{pattern})*{prefix}',
+        )
+
+    def _reduce(self, regex: Regex, handlers: list[Callable], leaf: Callable) -> Any:
         tokens = regex.get_tokens(self._grammar.symbol_pool)
         state_stack = [0]
         token_stack = []
@@ -234,11 +368,11 @@ class RegexEngine:
                     value=Grammar.END_SYMBOL_NAME,
                     symbol=self._grammar.symbol_pool.get_terminal(Grammar.END_SYMBOL_NAME),
                 )
-            transition = parse_table.transitions[state].get(token.symbol, None)
+            transition = self._transitions[state].get(token.symbol, None)
             if transition is None:
                 raise ValueError(f'invalid regular expression {regex.pattern} for {regex.name}')
             if transition.type == Transition.TYPE_SHIFT:
-                node_stack.append(NFA())
+                node_stack.append(leaf())
                 token_stack.append(token)
                 state_stack.append(transition.target)
                 i += 1
@@ -251,7 +385,7 @@ class RegexEngine:
                 children, token_stack = token_stack[-right_length:], token_stack[:-right_length]
                 nodes, node_stack = node_stack[-right_length:], node_stack[:-right_length]
                 state_stack = state_stack[:-right_length]
-                node_stack.append(rule.handler(nodes, children))
+                node_stack.append(handlers[rule.id](nodes, children))
                 token_stack.append(Token(rule.left.name, rule.left))
                 i -= 1
                 tokens[i] = token_stack[-1]
@@ -260,9 +394,210 @@ class RegexEngine:
                 right_length = len(rule.right)
                 children = token_stack[-right_length:]
                 nodes, node_stack = node_stack[-right_length:], node_stack[:-right_length]
-                node_stack.append(rule.handler(nodes, children))
+                node_stack.append(handlers[rule.id](nodes, children))
                 break
-        dfa = node_stack[0]
+        return node_stack[0]
+
+    def parse(self, regex: Regex) -> NFA:
+        dfa = self._reduce(regex, [rule.handler for rule in self._rules], NFA)
         for state in dfa.end:
             state.accept_list.append(regex.name)
         return dfa
+
+    def translate(self, regex: Regex) -> list[tuple[str, CharSet, bool, str]]:
+        """
+        Translates a pattern into Python re syntax. The top-level alternatives are returned separately, each with the
+        set of characters a non-empty match of it can start with, so that the caller can pick the longest of them
+        instead of the first one that matches. The flag tells whether re is sure to find the longest match of the
+        alternative itself. Backtracking stops at the first match, so a pattern like a*(ab)* would match one
+        character of ab. If it is, the last item is a pattern that matches the longest prefix of any match, which
+        ends where a DFA for the alternative would stop looking ahead.
+        """
+        return [
+            (pattern, first, longest, prefix)
+            for pattern, first, _, _, longest, prefix in self._reduce(
+                regex, list(self.translators.values()), lambda: None,
+            )
+        ]
+
+    def compile(self, regex: Regex) -> NFA:
+        """
+        Same as parse, but the minimized automaton of each pattern is kept in a bounded LRU cache and handed out as a
+        copy, so that lexers sharing patterns only pay for the regex parse once.
+        """
+        dfa = self._cache.pop(regex.pattern, None)
+        if dfa is None:
+            dfa = self.parse(regex).to_dfa()
+            dfa.minimize()
+        self._cache[regex.pattern] = dfa
+        if len(self._cache) > self._cache_size:
+            self._cache.popitem(last=False)
+        nfa = dfa.copy()
+        for state in nfa.start.dfs():
+            if state.accept_list:
+                state.accept_list = [regex.name]
+        return nfa
+
+
+class RegexSet:
+    """
+    Matches a list of patterns at one position with Python re. Every top-level alternative becomes an optional
+    lookahead group, so all of them are tried and the longest match wins, with ties going to the pattern declared
+    first. The groups are split into one compiled pattern per class of first characters, so that only alternatives
+    which can start at a position are tried there. Patterns for which re might stop short of the longest match are
+    matched with a DFA instead, and the two results are compared the same way. Another lookahead group per
+    alternative finds how far a DFA would have looked ahead, so that scan reports the same stop as the DFA backends.
+    Each token costs a call into re, so this only beats a compiled DFA on texts made mostly of long tokens.
+    """
+    LOOKUP_SIZE = 256
+
+    def __init__(self, regex_list: list[Regex], engine: RegexEngine | None = None):
+        engine = engine or RegexEngine.shared()
+        self.order = {regex.name: i for i, regex in reversed(list(enumerate(regex_list)))}
+        alternatives = []
+        fallback = []
+        for regex in regex_list:
+            translation = engine.translate(regex)
+            if all(longest for _, _, longest, _ in translation):
+                alternatives.extend((regex.name, pattern, first, prefix) for pattern, first, _, prefix in translation)
+            else:
+                fallback.append(regex)
+        self.dfa = None
+        if fallback:
+            dfa = NFA.union([engine.compile(regex) for regex in fallback]).to_dfa(
+                priority=[regex.name for regex in fallback],
+            )
+            dfa.minimize()
+            self.dfa = dfa.compile()
+        self.dfa_lookup = [
+            self.dfa is not None and self.dfa.table[self.dfa.lookup[code]] >= 0 for code in range(RegexSet.LOOKUP_SIZE)
+        ]
+        self.bounds, self.interval_classes, class_members = CharSet.classify([first for _, _, first, _ in alternatives])
+        self.patterns = [None]
+        for members in class_members[1:]:
+            selected = [alternatives[i] for i in sorted(members)]
+            # The first groups hold the prefixes, which always match, and the next ones the alternatives.
+            self.patterns.append((
+                re.compile(
+                    ''.join(f'(?=({prefix}))' for *_, prefix in selected)
+                    + ''.join(f'(?:(?=({pattern})))?' for _, pattern, _, _ in selected)
+                ),
+                len(selected),
+                [name for name, *_ in selected],
+            ))
+        self.lookup = [
+            self.interval_classes[bisect.bisect_right(self.bounds, code) - 1]
+            for code in range(RegexSet.LOOKUP_SIZE)
+        ]
+
+    def scan(self, text: str, start: int = 0) -> tuple[str | None, int, int]:
+        if start >= len(text):
+            return None, start, len(text)
+        c = ord(text[start])
+        if c < RegexSet.LOOKUP_SIZE:
+            entry = self.patterns[self.lookup[c]]
+        else:
+            entry = self.patterns[self.interval_classes[bisect.bisect_right(self.bounds, c) - 1]]
+        name, end, stop = None, start, start
+        if entry is not None:
+            pattern, count, names = entry
+            ends = list(map(_get_end, pattern.match(text, start).regs))
+            stop = max(ends[1:count + 1])
+            end = max(ends[count + 1:])
+            if end > start:
+                name = names[ends.index(end, count + 1) - count - 1]
+            else:
+                end = start
+        if c < RegexSet.LOOKUP_SIZE and self.dfa_lookup[c] or c >= RegexSet.LOOKUP_SIZE and self.dfa is not None:
+            dfa_name, dfa_end, dfa_stop = self.dfa.scan(text, start)
+            stop = max(stop, dfa_stop)
+            if dfa_name is not None and (name is None or (-dfa_end, self.order[dfa_name]) < (-end, self.order[name])):
+                name, end = dfa_name, dfa_end
+        return name, end, stop
+
+    def match(self, text: str, start: int = 0) -> tuple[str, int] | None:
+        name, end, _ = self.scan(text, start)
+        if name is None:
+            return None
+        return name, end
+
+
+def _get_end(span: tuple[int, int]) -> int:
+    return span[1]
+
+
+def _translate_charset(charset: CharSet) -> tuple[str, CharSet, bool, CharSet, bool, str]:
+    pattern = _charset_to_pattern(charset)
+    return pattern, charset, False, CharSet(), True, f'{pattern}?' if charset else ''
+
+
+def _charset_to_pattern(charset: CharSet) -> str:
+    if not charset:
+        return '(?!)'
+    if len(charset.ranges) == 1 and charset.ranges[0][0] == charset.ranges[0][1]:
+        return re.escape(chr(charset.ranges[0][0]))
+    parts = []
+    for lo, hi in charset.ranges:
+        parts.append(re.escape(chr(lo)) if lo == hi else f'{re.escape(chr(lo))}-{re.escape(chr(hi))}')
+    return f'[{"".join(parts)}]'
+
+
+# Generated by RegexEngine.compute_parse_table().
+_PARSE_TABLE = [
+    {'(': (1, 1), '.': (1, 2), 'E': (0, 3), 'F': (0, 4), 'P': (0, 5), 'T': (0, 6), '[': (1, 7), 'char': (1, 8)},
+    {'(': (1, 9), '.': (1, 10), 'E': (0, 11), 'F': (0, 12), 'P': (0, 13), 'T': (0, 14), '[': (1, 15), 'char': (1, 16)},
+    {'$': (2, 8), '(': (2, 8), '*': (2, 8), '+': (2, 8), '.': (2, 8), '[': (2, 8), 'char': (2, 8), '|': (2, 8)},
+    {'|': (1, 17)},
+    {'$': (2, 3), '(': (2, 3), '*': (1, 18), '+': (1, 19), '.': (2, 3), '[': (2, 3), 'char': (2, 3), '|': (2, 3)},
+    {'$': (2, 7), '(': (2, 7), '*': (2, 7), '+': (2, 7), '.': (2, 7), '[': (2, 7), 'char': (2, 7), '|': (2, 7)},
+    {'$': (3, 1), '(': (1, 1), '.': (1, 2), 'F': (0, 20), 'P': (0, 5), '[': (1, 7), 'char': (1, 8), '|': (2, 1)},
+    {'.': (1, 21), 'P': (0, 22), 'Px': (0, 23), '^': (1, 24), 'char': (1, 25)},
+    {
+        '$': (2, 9), '(': (2, 9), '*': (2, 9), '+': (2, 9), '-': (1, 26), '.': (2, 9), '[': (2, 9), 'char': (2, 9),
+        '|': (2, 9),
+    },
+    {'(': (1, 9), '.': (1, 10), 'E': (0, 27), 'F': (0, 12), 'P': (0, 13), 'T': (0, 14), '[': (1, 15), 'char': (1, 16)},
+    {'(': (2, 8), ')': (2, 8), '*': (2, 8), '+': (2, 8), '.': (2, 8), '[': (2, 8), 'char': (2, 8), '|': (2, 8)},
+    {')': (1, 28), '|': (1, 29)},
+    {'(': (2, 3), ')': (2, 3), '*': (1, 30), '+': (1, 31), '.': (2, 3), '[': (2, 3), 'char': (2, 3), '|': (2, 3)},
+    {'(': (2, 7), ')': (2, 7), '*': (2, 7), '+': (2, 7), '.': (2, 7), '[': (2, 7), 'char': (2, 7), '|': (2, 7)},
+    {'(': (1, 9), ')': (2, 1), '.': (1, 10), 'F': (0, 32), 'P': (0, 13), '[': (1, 15), 'char': (1, 16), '|': (2, 1)},
+    {'.': (1, 21), 'P': (0, 22), 'Px': (0, 33), '^': (1, 34), 'char': (1, 25)},
+    {
+        '(': (2, 9), ')': (2, 9), '*': (2, 9), '+': (2, 9), '-': (1, 35), '.': (2, 9), '[': (2, 9), 'char': (2, 9),
+        '|': (2, 9),
+    },
+    {'(': (1, 1), '.': (1, 2), 'F': (0, 4), 'P': (0, 5), 'T': (0, 36), '[': (1, 7), 'char': (1, 8)},
+    {'$': (2, 5), '(': (2, 5), '*': (2, 5), '+': (2, 5), '.': (2, 5), '[': (2, 5), 'char': (2, 5), '|': (2, 5)},
+    {'$': (2, 6), '(': (2, 6), '*': (2, 6), '+': (2, 6), '.': (2, 6), '[': (2, 6), 'char': (2, 6), '|': (2, 6)},
+    {'$': (2, 2), '(': (2, 2), '*': (1, 18), '+': (1, 19), '.': (2, 2), '[': (2, 2), 'char': (2, 2), '|': (2, 2)},
+    {'.': (2, 8), ']': (2, 8), 'char': (2, 8)},
+    {'.': (2, 12), ']': (2, 12), 'char': (2, 12)},
+    {'.': (1, 21), 'P': (0, 37), ']': (1, 38), 'char': (1, 25)},
+    {'.': (1, 21), 'P': (0, 22), 'Px': (0, 39), 'char': (1, 25)},
+    {'-': (1, 40), '.': (2, 9), ']': (2, 9), 'char': (2, 9)},
+    {'char': (1, 41)},
+    {')': (1, 42), '|': (1, 29)},
+    {'$': (2, 4), '(': (2, 4), '*': (2, 4), '+': (2, 4), '.': (2, 4), '[': (2, 4), 'char': (2, 4), '|': (2, 4)},
+    {'(': (1, 9), '.': (1, 10), 'F': (0, 12), 'P': (0, 13), 'T': (0, 43), '[': (1, 15), 'char': (1, 16)},
+    {'(': (2, 5), ')': (2, 5), '*': (2, 5), '+': (2, 5), '.': (2, 5), '[': (2, 5), 'char': (2, 5), '|': (2, 5)},
+    {'(': (2, 6), ')': (2, 6), '*': (2, 6), '+': (2, 6), '.': (2, 6), '[': (2, 6), 'char': (2, 6), '|': (2, 6)},
+    {'(': (2, 2), ')': (2, 2), '*': (1, 30), '+': (1, 31), '.': (2, 2), '[': (2, 2), 'char': (2, 2), '|': (2, 2)},
+    {'.': (1, 21), 'P': (0, 37), ']': (1, 44), 'char': (1, 25)},
+    {'.': (1, 21), 'P': (0, 22), 'Px': (0, 45), 'char': (1, 25)},
+    {'char': (1, 46)},
+    {'$': (3, 0), '(': (1, 1), '.': (1, 2), 'F': (0, 20), 'P': (0, 5), '[': (1, 7), 'char': (1, 8), '|': (2, 0)},
+    {'.': (2, 11), ']': (2, 11), 'char': (2, 11)},
+    {'$': (2, 13), '(': (2, 13), '*': (2, 13), '+': (2, 13), '.': (2, 13), '[': (2, 13), 'char': (2, 13), '|': (2, 13)},
+    {'.': (1, 21), 'P': (0, 37), ']': (1, 47), 'char': (1, 25)},
+    {'char': (1, 48)},
+    {'$': (2, 10), '(': (2, 10), '*': (2, 10), '+': (2, 10), '.': (2, 10), '[': (2, 10), 'char': (2, 10), '|': (2, 10)},
+    {'(': (2, 4), ')': (2, 4), '*': (2, 4), '+': (2, 4), '.': (2, 4), '[': (2, 4), 'char': (2, 4), '|': (2, 4)},
+    {'(': (1, 9), ')': (2, 0), '.': (1, 10), 'F': (0, 32), 'P': (0, 13), '[': (1, 15), 'char': (1, 16), '|': (2, 0)},
+    {'(': (2, 13), ')': (2, 13), '*': (2, 13), '+': (2, 13), '.': (2, 13), '[': (2, 13), 'char': (2, 13), '|': (2, 13)},
+    {'.': (1, 21), 'P': (0, 37), ']': (1, 49), 'char': (1, 25)},
+    {'(': (2, 10), ')': (2, 10), '*': (2, 10), '+': (2, 10), '.': (2, 10), '[': (2, 10), 'char': (2, 10), '|': (2, 10)},
+    {'$': (2, 14), '(': (2, 14), '*': (2, 14), '+': (2, 14), '.': (2, 14), '[': (2, 14), 'char': (2, 14), '|': (2, 14)},
+    {'.': (2, 10), ']': (2, 10), 'char': (2, 10)},
+    {'(': (2, 14), ')': (2, 14), '*': (2, 14), '+': (2, 14), '.': (2, 14), '[': (2, 14), 'char': (2, 14), '|': (2, 14)},
+]
@@ -0,0 +1,133 @@
+import array
+import bisect
+
+from typing import Iterable, Iterator, overload
+
+from ptree.symbol.symbol import Terminal, Token
+
+
+class TokenStream:
+    """
+    Stores tokens as columns of symbol ids and offsets into the source text. Token objects, with their values, are
+    only created when accessed.
+    """
+
+    def __init__(self, text: str, symbols: list[Terminal]):
+        self.text = text
+        self.symbols = symbols
+        self.symbol_ids = array.array('i')
+        self.starts = array.array('i')
+        self.ends = array.array('i')
+
+    def append(self, symbol_id: int, start: int, end: int):
+        self.symbol_ids.append(symbol_id)
+        self.starts.append(start)
+        self.ends.append(end)
+
+    def __len__(self) -> int:
+        return len(self.symbol_ids)
+
+    @overload
+    def __getitem__(self, index: int) -> Token:
+        ...
+
+    @overload
+    def __getitem__(self, index: slice) -> list[Token]:
+        ...
+
+    def __getitem__(self, index: int | slice) -> Token | list[Token]:
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        start, end = self.starts[index], self.ends[index]
+        return Token(value=self.text[start:end], symbol=self.symbols[self.symbol_ids[index]], start=start, end=end)
+
+    def __iter__(self) -> Iterator[Token]:
+        text, symbols = self.text, self.symbols
+        for symbol_id, start, end in zip(self.symbol_ids, self.starts, self.ends):
+            yield Token(value=text[start:end], symbol=symbols[symbol_id], start=start, end=end)
+
+
+class TokenBuffer:
+    """
+    Holds the tokens of a text that is edited with Lexer.relex. An edit shifts the offsets of every later token, so
+    the shift is kept pending for the tokens after a gap, as in a gap buffer, and only applied when the gap moves over
+    them. Also tracks the furthest any scan looked ahead from where it started, which bounds how far back an edit
+    can change the tokens.
+    """
+
+    def __init__(self, tokens: Iterable[Token]):
+        self._tokens = list(tokens)
+        self._gap = len(self._tokens)
+        self._delta = 0
+        self.lookahead = 0
+        end = 0
+        for token in self._tokens:
+            self.lookahead = max(self.lookahead, token.stop - end)
+            end = token.end
+
+    def __len__(self) -> int:
+        return len(self._tokens)
+
+    @overload
+    def __getitem__(self, index: int) -> Token:
+        ...
+
+    @overload
+    def __getitem__(self, index: slice) -> list[Token]:
+        ...
+
+    def __getitem__(self, index: int | slice) -> Token | list[Token]:
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        token = self._tokens[index]
+        if index < self._gap or not self._delta:
+            return token
+        return _shift(token, self._delta)
+
+    def __iter__(self) -> Iterator[Token]:
+        for i in range(len(self)):
+            yield self[i]
+
+    def find(self, start: int) -> int:
+        """
+        Returns the index of the first token that starts at or after start.
+        """
+        tokens, gap = self._tokens, self._gap
+        if gap < len(tokens) and tokens[gap].start + self._delta < start:
+            return bisect.bisect_left(tokens, start - self._delta, lo=gap, key=_get_start)
+        return bisect.bisect_left(tokens, start, hi=gap, key=_get_start)
+
+    def replace(self, first: int, old_end: int, new_tokens: list[Token], delta: int, lookahead: int):
+        """
+        Replaces tokens[first:old_end] by new_tokens and shifts the tokens after them by delta.
+        """
+        self._move_gap(first)
+        self._tokens[first:old_end] = new_tokens
+        self._gap = first + len(new_tokens)
+        self._delta += delta
+        self.lookahead = max(self.lookahead, lookahead)
+
+    def _move_gap(self, index: int):
+        tokens, delta = self._tokens, self._delta
+        if delta:
+            for i in range(self._gap, index):
+                tokens[i] = _shift(tokens[i], delta)
+            for i in range(index, self._gap):
+                tokens[i] = _shift(tokens[i], -delta)
+        self._gap = index
+
+
+def _shift(token: Token, delta: int) -> Token:
+    return Token(
+        value=token.value,
+        symbol=token.symbol,
+        start=token.start + delta,
+        end=token.end + delta,
+        stop=token.stop + delta,
+    )
+
+
+def _get_start(token: Token) -> int:
+    return token.start
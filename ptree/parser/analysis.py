@@ -0,0 +1,177 @@
+import collections
+
+from typing import Iterator
+
+from ptree.symbol.symbol import Symbol, Terminal, Nonterminal
+from ptree.symbol.pool import SymbolPool
+
+DOT_BITS = 16
+
+
+def pack_item(rule_id: int, dot: int) -> int:
+    return rule_id << DOT_BITS | dot
+
+
+def unpack_item(item: int) -> tuple[int, int]:
+    return item >> DOT_BITS, item & ((1 << DOT_BITS) - 1)
+
+
+def iter_bits(bits: int) -> Iterator[int]:
+    while bits:
+        low_bit = bits & -bits
+        yield low_bit.bit_length() - 1
+        bits ^= low_bit
+
+
+class GrammarAnalysis:
+    """
+    Computes nullable symbols and FIRST and FOLLOW sets from the dependencies between symbols. Nullability is found
+    with a worklist, FIRST and FOLLOW with one traversal of their dependency graphs, so every rule is only looked at a
+    bounded number of times. Sets of terminals are bitsets over terminals sorted by name, see terminals. FIRST and
+    nullability are also kept for the suffix of every rule at every dot, keyed by packed items.
+    """
+
+    def __init__(self, rules: list, symbol_pool: SymbolPool, start_symbol: Nonterminal):
+        from ptree.parser.grammar import Grammar
+        self.rules = rules
+        self.symbol_pool = symbol_pool
+        self.start_symbol = start_symbol
+        self.null_symbol = symbol_pool.get_terminal(Grammar.NULL_SYMBOL_NAME)
+        self.end_symbol = symbol_pool.get_terminal(Grammar.END_SYMBOL_NAME)
+        self.terminals = sorted(set(symbol_pool.get_terminals()) - {self.null_symbol}, key=lambda x: x.name)
+        self.terminal_id_map = {terminal: i for i, terminal in enumerate(self.terminals)}
+        self.nullable = self._compute_nullable()
+        self.first = self._compute_first()
+        self.suffix_firsts, self.suffix_nullables = self._compute_suffixes()
+        self.follow = self._compute_follow()
+
+    def is_nullable(self, symbol: Symbol) -> bool:
+        return symbol == self.null_symbol or symbol in self.nullable
+
+    def get_first(self, symbol: Symbol) -> int:
+        if isinstance(symbol, Terminal):
+            return 0 if symbol == self.null_symbol else 1 << self.terminal_id_map[symbol]
+        return self.first[symbol]
+
+    def to_symbols(self, bits: int) -> set[Terminal]:
+        return {self.terminals[terminal_id] for terminal_id in iter_bits(bits)}
+
+    def _compute_nullable(self) -> set[Nonterminal]:
+        # Every rule counts the symbols on its right that are not known to be nullable yet.
+        counts = []
+        occurrences = collections.defaultdict(list)
+        symbol_queue = collections.deque()
+        nullable = set()
+        for rule in self.rules:
+            count = 0
+            for symbol in rule.right:
+                if isinstance(symbol, Nonterminal):
+                    occurrences[symbol].append(rule.id)
+                    count += 1
+                elif symbol != self.null_symbol:
+                    count = -1
+                    break
+            counts.append(count)
+            if count == 0 and rule.left not in nullable:
+                nullable.add(rule.left)
+                symbol_queue.append(rule.left)
+        while symbol_queue:
+            symbol = symbol_queue.popleft()
+            for rule_id in occurrences[symbol]:
+                counts[rule_id] -= 1
+                left = self.rules[rule_id].left
+                if counts[rule_id] == 0 and left not in nullable:
+                    nullable.add(left)
+                    symbol_queue.append(left)
+        return nullable
+
+    def _compute_first(self) -> dict[Nonterminal, int]:
+        nonterminals = list(self.symbol_pool.get_nonterminals())
+        nonterminal_id_map = {symbol: i for i, symbol in enumerate(nonterminals)}
+        first = [0] * len(nonterminals)
+        relations = [[] for _ in nonterminals]
+        for rule in self.rules:
+            left_id = nonterminal_id_map[rule.left]
+            for symbol in rule.right:
+                if isinstance(symbol, Nonterminal):
+                    relations[left_id].append(nonterminal_id_map[symbol])
+                else:
+                    first[left_id] |= self.get_first(symbol)
+                if not self.is_nullable(symbol):
+                    break
+        return dict(zip(nonterminals, _digraph(relations, first)))
+
+    def _compute_suffixes(self) -> tuple[dict[int, int], dict[int, bool]]:
+        suffix_firsts, suffix_nullables = {}, {}
+        for rule in self.rules:
+            first, nullable = 0, True
+            suffix_firsts[pack_item(rule.id, len(rule.right))] = first
+            suffix_nullables[pack_item(rule.id, len(rule.right))] = nullable
+            for dot in range(len(rule.right) - 1, -1, -1):
+                symbol = rule.right[dot]
+                if self.is_nullable(symbol):
+                    first |= self.get_first(symbol)
+                else:
+                    first, nullable = self.get_first(symbol), False
+                suffix_firsts[pack_item(rule.id, dot)] = first
+                suffix_nullables[pack_item(rule.id, dot)] = nullable
+        return suffix_firsts, suffix_nullables
+
+    def _compute_follow(self) -> dict[Nonterminal, int]:
+        nonterminals = list(self.symbol_pool.get_nonterminals())
+        nonterminal_id_map = {symbol: i for i, symbol in enumerate(nonterminals)}
+        follow = [0] * len(nonterminals)
+        follow[nonterminal_id_map[self.start_symbol]] = 1 << self.terminal_id_map[self.end_symbol]
+        relations = [[] for _ in nonterminals]
+        for rule in self.rules:
+            left_id = nonterminal_id_map[rule.left]
+            for dot, symbol in enumerate(rule.right):
+                if isinstance(symbol, Nonterminal):
+                    symbol_id = nonterminal_id_map[symbol]
+                    follow[symbol_id] |= self.suffix_firsts[pack_item(rule.id, dot + 1)]
+                    if self.suffix_nullables[pack_item(rule.id, dot + 1)]:
+                        relations[symbol_id].append(left_id)
+        return dict(zip(nonterminals, _digraph(relations, follow)))
+
+
+def _digraph(relations: list[list[int]], values: list[int]) -> list[int]:
+    """
+    Computes the smallest sets F with F(x) = values[x] | F(y) for every y in relations[x], following DeRemer and
+    Pennello. Each strongly connected component is visited once and shares one result.
+    """
+    results = list(values)
+    depths = [0] * len(values)
+    done = len(values) + 1
+    node_stack = []
+    for root in range(len(values)):
+        if depths[root]:
+            continue
+        node_stack.append(root)
+        depths[root] = len(node_stack)
+        work_stack = [(root, 0, len(node_stack))]
+        while work_stack:
+            x, i, depth = work_stack[-1]
+            if i < len(relations[x]):
+                work_stack[-1] = (x, i + 1, depth)
+                y = relations[x][i]
+                if not depths[y]:
+                    node_stack.append(y)
+                    depths[y] = len(node_stack)
+                    work_stack.append((y, 0, len(node_stack)))
+                    continue
+                depths[x] = min(depths[x], depths[y])
+                results[x] |= results[y]
+                continue
+            work_stack.pop()
+            if depths[x] == depth:
+                while True:
+                    y = node_stack.pop()
+                    depths[y] = done
+                    results[y] = results[x]
+                    if y == x:
+                        break
+            if work_stack:
+                parent = work_stack[-1][0]
+                depths[parent] = min(depths[parent], depths[x])
+                results[parent] |= results[x]
+    return results
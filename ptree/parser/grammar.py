@@ -1,25 +1,43 @@
+import os
+import json
+import array
+import hashlib
+import pathlib
+import contextlib
+import collections
+
 from typing import Self, Any
 
 from ptree.symbol.symbol import Symbol, Terminal, Nonterminal
 from ptree.symbol.pool import SymbolPool
+from ptree.parser.analysis import GrammarAnalysis, pack_item, unpack_item, iter_bits
 
 
 class ProductionRule:
 
-    def __init__(self, left: Nonterminal, right: list[Symbol]):
+    def __init__(self, left: Nonterminal, right: list[Symbol], precedence: str | None = None):
         self.id = None
         self.left = left
         self.right = right
         self.handler = None
+        self.precedence = precedence
 
     @classmethod
     def from_string(cls, rule: str, symbol_pool: SymbolPool) -> Self:
         if '->' not in rule:
             raise ValueError(f'invalid rule: {rule}')
         left, right = rule.split('->')
+        right = right.split()
+        precedence = None
+        if '%prec' in right:
+            i = right.index('%prec')
+            if i != len(right) - 2:
+                raise ValueError(f'invalid rule: {rule}')
+            right, precedence = right[:i], right[i + 1]
         return cls(
             symbol_pool.get_nonterminal(left.strip()),
-            [symbol_pool.get_symbol(right.strip()) for right in right.split()],
+            [symbol_pool.get_symbol(name) for name in right],
+            precedence,
         )
 
     def __eq__(self, other: 'ProductionRule') -> bool:
@@ -36,6 +54,12 @@ class ProductionRule:
     def __repr__(self) -> str:
         return f'ProductionRule({str(self)})'
 
+    def __getstate__(self) -> dict[str, Any]:
+        # Handlers belong to the process that attached them and are often lambdas, so they are not shipped.
+        state = self.__dict__.copy()
+        state['handler'] = None
+        return state
+
 
 class ParseItem:
 
@@ -77,42 +101,69 @@ class ParseItem:
 
 
 class ParseState:
-
-    def __init__(self, symbol_pool: SymbolPool):
-        self._symbol_pool = symbol_pool
-        self.items = set()
-
-    def _compute_head(self, symbols: list[Symbol]) -> set[Symbol]:
-        head = set()
-        for symbol in symbols:
-            if isinstance(symbol, Nonterminal):
-                head |= symbol.first
-                if not symbol.nullable:
-                    break
-            else:
-                head.add(symbol)
-                if symbol.name != Grammar.NULL_SYMBOL_NAME:
-                    break
-        head.discard(self._symbol_pool.get_terminal(Grammar.NULL_SYMBOL_NAME))
-        return head
-
-    def closure(self):
-        while True:
-            new_items = set()
-            for item in self.items:
-                if item.is_end():
-                    continue
-                symbol = item.next()
-                if isinstance(symbol, Nonterminal):
-                    lookahead_symbols = item.rule.right[item.dot + 1:]
-                    lookahead_symbols.append(item.lookahead)
-                    head = self._compute_head(lookahead_symbols)
-                    for rule in symbol.rules:
-                        for lookahead in head:
-                            new_items.add(ParseItem(rule, lookahead))
-            if new_items.issubset(self.items):
-                break
-            self.items |= new_items
+    """
+    An LR item set. Items are packed into integers, see pack_item, and the items of one core share a bitset of
+    lookahead terminals.
+    """
+
+    def __init__(self, parse_table: 'ParseTable', kernel: dict[int, int] | None = None):
+        self._parse_table = parse_table
+        self.kernel = dict(kernel or {})
+        self.items = dict(self.kernel)
+
+    def closure(self, items: dict[int, int] | None = None):
+        """
+        Adds the given items, all items of the state by default, along with the items derived from them. Only items
+        that gained lookaheads are expanded further.
+        """
+        parse_table = self._parse_table
+        if items is None:
+            item_queue = list(self.items)
+        else:
+            item_queue = []
+            for item, lookaheads in items.items():
+                self.items[item] = self.items.get(item, 0) | lookaheads
+                item_queue.append(item)
+        while item_queue:
+            item = item_queue.pop()
+            symbol = parse_table.next_symbols[item]
+            if not isinstance(symbol, Nonterminal):
+                continue
+            head = parse_table.analysis.suffix_firsts[item + 1]
+            if parse_table.analysis.suffix_nullables[item + 1]:
+                head |= self.items[item]
+            for rule in symbol.rules:
+                new_item = pack_item(rule.id, 0)
+                lookaheads = self.items.get(new_item, 0)
+                if head & ~lookaheads:
+                    self.items[new_item] = lookaheads | head
+                    item_queue.append(new_item)
+
+    def get_items(self) -> list[ParseItem]:
+        parse_table = self._parse_table
+        parse_items = []
+        for item, lookaheads in sorted(self.items.items()):
+            rule_id, dot = unpack_item(item)
+            for terminal_id in iter_bits(lookaheads):
+                parse_items.append(ParseItem(
+                    parse_table.analysis.rules[rule_id],
+                    parse_table.analysis.terminals[terminal_id],
+                    dot,
+                ))
+        return parse_items
+
+    def is_weakly_compatible(self, other: 'ParseState') -> bool:
+        """
+        Pager's weak compatibility test on the kernels of two states with the same core: merging them cannot introduce
+        a conflict that neither of them has on its own.
+        """
+        cores = list(self.kernel)
+        for i, core in enumerate(cores):
+            for core_ in cores[i + 1:]:
+                if self.kernel[core] & other.kernel[core_] or self.kernel[core_] & other.kernel[core]:
+                    if not self.kernel[core] & self.kernel[core_] and not other.kernel[core] & other.kernel[core_]:
+                        return False
+        return True
 
     def __eq__(self, other: 'ParseState') -> bool:
         if isinstance(other, ParseState):
@@ -120,10 +171,10 @@ class ParseState:
         return False
 
     def __hash__(self) -> int:
-        return hash(tuple(self.items))
+        return hash(frozenset(self.items.items()))
 
     def __str__(self) -> str:
-        return f'{{{"; ".join(map(str, self.items))}}}'
+        return f'{{{"; ".join(map(str, self.get_items()))}}}'
 
     def __repr__(self) -> str:
         return f'ParseState({str(self)})'
@@ -165,62 +216,420 @@ class Transition:
         return f'Transition({str(self)})'
 
 
+class Conflict:
+
+    def __init__(self, state: int, symbol: Terminal, transitions: list[Transition]):
+        self.state = state
+        self.symbol = symbol
+        self.transitions = transitions
+
+    def __str__(self) -> str:
+        type_desc = 'shift-reduce' if self.transitions[0].type == Transition.TYPE_SHIFT else 'reduce-reduce'
+        return f'{type_desc} conflict in state {self.state} on {self.symbol}: ' \
+               f'{"; ".join(map(str, self.transitions))}, the first one is kept'
+
+    def __repr__(self) -> str:
+        return f'Conflict({str(self)})'
+
+
 class ParseTable:
+    VERSION = 3
+    MODE_LR1 = 'lr1'
+    MODE_LALR1 = 'lalr1'
+    MODE_PAGER = 'pager'
 
     def __init__(self,
                  config: dict[str, Any],
                  symbol_pool: SymbolPool,
-                 start_symbol: Nonterminal):
+                 start_symbol: Nonterminal,
+                 analysis: GrammarAnalysis,
+                 mode: str = MODE_LR1,
+                 build: bool = True):
+        if mode not in {ParseTable.MODE_LR1, ParseTable.MODE_LALR1, ParseTable.MODE_PAGER}:
+            raise ValueError(f'unknown parse table mode: {mode}')
         self.config = config
         self.symbol_pool = symbol_pool
         self.start_symbol = start_symbol
+        self.analysis = analysis
+        self.mode = mode
         self.transitions = {}
-
-        state_list = []
-        start_state = ParseState(self.symbol_pool)
-        for rule in self.start_symbol.rules:
-            item = ParseItem(rule=rule, lookahead=self.symbol_pool.get_terminal(Grammar.END_SYMBOL_NAME))
-            start_state.items.add(item)
-        start_state.closure()
-        state_list.append(start_state)
-        self.state_id_map = {start_state: 0}
-
-        while True:
-            state = state_list.pop(0)
-            for item in state.items:
-                if item.is_end():
+        self.errors = {}
+        self.states = []
+        self._state_id_map = {}
+        self.precedence = {}
+        for level, entry in enumerate(self.config.get('precedence') or [], start=1):
+            (associativity, names), = entry.items()
+            if associativity not in {'left', 'right', 'nonassoc'}:
+                raise ValueError(f'invalid associativity: {associativity}')
+            for name in names:
+                self.precedence[name] = (level, associativity)
+        for rule in self.analysis.rules:
+            if rule.precedence is not None and rule.precedence not in self.precedence:
+                raise ValueError(f'undeclared precedence {rule.precedence} in rule {rule}')
+        self.conflicts = []
+        self.next_symbols = {}
+        for rule in self.analysis.rules:
+            for dot in range(len(rule.right) + 1):
+                if rule.right[0] == self.analysis.null_symbol or dot == len(rule.right):
+                    self.next_symbols[pack_item(rule.id, dot)] = None
+                else:
+                    self.next_symbols[pack_item(rule.id, dot)] = rule.right[dot]
+        if build:
+            self._build()
+
+    def _build(self):
+        conflicts = {}
+        end_symbol = self.analysis.end_symbol
+        state_queue = collections.deque()
+        queued = set()
+        end_bits = 1 << self.analysis.terminal_id_map[end_symbol]
+        self._add_state({pack_item(rule.id, 0): end_bits for rule in self.start_symbol.rules}, state_queue, queued)
+        while state_queue:
+            state_id = state_queue.popleft()
+            queued.discard(state_id)
+            state = self.states[state_id]
+            kernels = {}
+            reduce_items = []
+            for item, lookaheads in state.items.items():
+                symbol = self.next_symbols[item]
+                if symbol is None:
+                    reduce_items.append((item, lookaheads))
+                else:
+                    kernels.setdefault(symbol, {})[item + 1] = lookaheads
+            # A state that grew through a merge is processed again, so its transitions are rebuilt from scratch.
+            transitions = self.transitions[state_id] = {}
+            for symbol in sorted(kernels, key=lambda x: (x.type, x.name)):
+                if isinstance(symbol, Terminal):
+                    transition_type = Transition.TYPE_SHIFT
+                else:
+                    transition_type = Transition.TYPE_GOTO
+                transitions[symbol] = Transition(
+                    source=state_id,
+                    target=self._add_state(kernels[symbol], state_queue, queued),
+                    symbol=symbol,
+                    transition_type=transition_type,
+                )
+            # Conflicts are settled by precedence where declared. Otherwise shifts win over reductions and earlier
+            # rules win over later ones, and the conflict is reported.
+            state_conflicts = conflicts[state_id] = []
+            errors = self.errors[state_id] = set()
+            error_transitions = {}
+            for item, lookaheads in sorted(reduce_items):
+                rule = self.analysis.rules[unpack_item(item)[0]]
+                for terminal_id in iter_bits(lookaheads):
+                    lookahead = self.analysis.terminals[terminal_id]
                     transition_type = Transition.TYPE_REDUCE
-                    if item.rule.left == self.start_symbol and \
-                            item.lookahead == self.symbol_pool.get_terminal(Grammar.END_SYMBOL_NAME):
+                    if rule.left == self.start_symbol and lookahead == end_symbol:
                         transition_type = Transition.TYPE_ACCEPT
-                    self.transitions.setdefault(self.state_id_map[state], {})[item.lookahead] = Transition(
-                        source=self.state_id_map[state],
-                        target=item.rule,
-                        symbol=item.lookahead,
+                    transition = Transition(
+                        source=state_id,
+                        target=rule,
+                        symbol=lookahead,
                         transition_type=transition_type,
                     )
-                else:
-                    symbol = item.next()
-                    new_state = ParseState(self.symbol_pool)
-                    for item_ in state.items:
-                        if item_.next() == symbol:
-                            new_state.items.add(ParseItem.advance(item_))
-                    new_state.closure()
-                    if new_state not in self.state_id_map:
-                        state_list.append(new_state)
-                        self.state_id_map[new_state] = len(self.state_id_map)
-                    if isinstance(symbol, Terminal):
-                        transition_type = Transition.TYPE_SHIFT
+                    if lookahead in errors:
+                        # The reduction that nonassoc turned into an error is kept, but the clash is still reported.
+                        state_conflicts.append(
+                            Conflict(state_id, lookahead, [error_transitions[lookahead], transition]),
+                        )
+                        continue
+                    existing_transition = transitions.get(lookahead)
+                    if existing_transition is None:
+                        transitions[lookahead] = transition
+                    elif existing_transition.type == Transition.TYPE_SHIFT:
+                        match self._resolve(rule, lookahead):
+                            case 'reduce':
+                                transitions[lookahead] = transition
+                            case 'error':
+                                del transitions[lookahead]
+                                errors.add(lookahead)
+                                error_transitions[lookahead] = transition
+                            case None:
+                                state_conflicts.append(Conflict(state_id, lookahead, [existing_transition, transition]))
                     else:
-                        transition_type = Transition.TYPE_GOTO
-                    self.transitions.setdefault(self.state_id_map[state], {})[symbol] = Transition(
-                        source=self.state_id_map[state],
-                        target=self.state_id_map[new_state],
-                        symbol=symbol,
-                        transition_type=transition_type,
-                    )
-            if not state_list:
-                break
+                        state_conflicts.append(Conflict(state_id, lookahead, [existing_transition, transition]))
+        self.conflicts = [conflict for state_id in sorted(conflicts) for conflict in conflicts[state_id]]
+
+    @classmethod
+    def load(cls,
+             path: pathlib.Path | str,
+             config: dict[str, Any],
+             symbol_pool: SymbolPool,
+             start_symbol: Nonterminal,
+             analysis: GrammarAnalysis,
+             mode: str = MODE_LR1) -> Self | None:
+        """
+        Restores a table written by save. Returns None if the file is missing, damaged or written by another version,
+        so that the caller rebuilds it.
+        """
+        try:
+            with open(path, 'rb') as f:
+                data = json.load(f)
+            if data['version'] != ParseTable.VERSION:
+                return None
+            states, transitions, errors = data['states'], data['transitions'], data['errors']
+            if not states or len(transitions) != len(states) or len(errors) != len(states):
+                return None
+            parse_table = cls(config, symbol_pool, start_symbol, analysis, mode, build=False)
+            for kernel, items in states:
+                state = ParseState(parse_table, dict(kernel))
+                state.items = dict(items)
+                parse_table.states.append(state)
+
+            def to_transition(source: int, name: str, transition_type: int, target: int) -> Transition:
+                if transition_type in {Transition.TYPE_REDUCE, Transition.TYPE_ACCEPT}:
+                    target = analysis.rules[target]
+                elif transition_type not in {Transition.TYPE_SHIFT, Transition.TYPE_GOTO} or target >= len(states):
+                    raise ValueError(f'invalid transition in state {source}')
+                return Transition(source, target, symbol_pool.get_symbol(name), transition_type)
+
+            for state_id, row in enumerate(transitions):
+                parse_table.transitions[state_id] = {
+                    transition.symbol: transition
+                    for transition in (to_transition(state_id, *entry) for entry in row)
+                }
+            parse_table.errors = {
+                state_id: {symbol_pool.get_terminal(name) for name in names} for state_id, names in enumerate(errors)
+            }
+            parse_table.conflicts = [
+                Conflict(
+                    state_id,
+                    symbol_pool.get_terminal(name),
+                    [to_transition(state_id, name, *entry) for entry in row],
+                )
+                for state_id, name, row in data['conflicts']
+            ]
+        except (OSError, ValueError, KeyError, TypeError, IndexError):
+            return None
+        return parse_table
+
+    def save(self, path: pathlib.Path | str):
+        """
+        Writes the table as JSON. Nothing in the file is executed on load, so a cache directory can be shared.
+        """
+        def to_entry(transition: Transition) -> tuple[int, int]:
+            if transition.type in {Transition.TYPE_REDUCE, Transition.TYPE_ACCEPT}:
+                return transition.type, transition.target.id
+            return transition.type, transition.target
+
+        data = {
+            'version': ParseTable.VERSION,
+            'states': [(list(state.kernel.items()), list(state.items.items())) for state in self.states],
+            'transitions': [
+                [(symbol.name, *to_entry(transition)) for symbol, transition in self.transitions[state_id].items()]
+                for state_id in range(len(self.states))
+            ],
+            'errors': [sorted(symbol.name for symbol in self.errors[state_id]) for state_id in range(len(self.states))],
+            'conflicts': [
+                (conflict.state, conflict.symbol.name, [to_entry(transition) for transition in conflict.transitions])
+                for conflict in self.conflicts
+            ],
+        }
+        path = pathlib.Path(path)
+        temp_path = path.with_name(f'{path.name}.{os.getpid()}.tmp')
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with open(temp_path, 'w') as f:
+                json.dump(data, f)
+            os.replace(temp_path, path)
+        except OSError:
+            with contextlib.suppress(OSError):
+                temp_path.unlink()
+            raise
+
+    def _get_rule_precedence(self, rule: ProductionRule) -> tuple[int, str] | None:
+        if rule.precedence is not None:
+            return self.precedence[rule.precedence]
+        for symbol in reversed(rule.right):
+            if isinstance(symbol, Terminal):
+                return self.precedence.get(symbol.name)
+        return None
+
+    def _resolve(self, rule: ProductionRule, lookahead: Terminal) -> str | None:
+        """
+        Settles a shift-reduce conflict like yacc. Returns shift, reduce or error, or None if the rule or the lookahead
+        has no precedence.
+        """
+        rule_precedence = self._get_rule_precedence(rule)
+        lookahead_precedence = self.precedence.get(lookahead.name)
+        if rule_precedence is None or lookahead_precedence is None:
+            return None
+        if rule_precedence[0] != lookahead_precedence[0]:
+            return 'reduce' if rule_precedence[0] > lookahead_precedence[0] else 'shift'
+        return {'left': 'reduce', 'right': 'shift', 'nonassoc': 'error'}[lookahead_precedence[1]]
+
+    def _add_state(self, kernel: dict[int, int], state_queue: collections.deque, queued: set[int]) -> int:
+        """
+        Returns the id of the state with the given kernel. Canonical LR(1) only reuses states with the same kernel.
+        LALR(1) merges every state with the same core into one, and Pager's mode only merges weakly compatible states.
+        A state that gains lookaheads through a merge is queued again, so that they reach its successors.
+        """
+        if self.mode == ParseTable.MODE_LR1:
+            key = frozenset(kernel.items())
+        else:
+            key = frozenset(kernel)
+        state_ids = self._state_id_map.setdefault(key, [])
+        for state_id in state_ids:
+            state = self.states[state_id]
+            if self.mode == ParseTable.MODE_PAGER and not state.is_weakly_compatible(ParseState(self, kernel)):
+                continue
+            new_items = {
+                item: lookaheads & ~state.kernel[item]
+                for item, lookaheads in kernel.items()
+                if lookaheads & ~state.kernel[item]
+            }
+            if new_items:
+                for item, lookaheads in new_items.items():
+                    state.kernel[item] |= lookaheads
+                state.closure(new_items)
+                if state_id not in queued:
+                    queued.add(state_id)
+                    state_queue.append(state_id)
+            return state_id
+        new_state = ParseState(self, kernel)
+        new_state.closure()
+        state_id = len(self.states)
+        self.states.append(new_state)
+        state_ids.append(state_id)
+        queued.add(state_id)
+        state_queue.append(state_id)
+        return state_id
+
+    def compile(self) -> 'CompiledParseTable':
+        return CompiledParseTable.from_parse_table(self)
+
+    def __len__(self) -> int:
+        return len(self.states)
+
+
+class CompiledParseTable:
+    """
+    A parse table over integer symbol ids. An action is packed as target << 2 | type, where the target is a state for
+    a shift and a rule for a reduction or an accept, and 0 is an error. Each state falls back to its most common
+    reduction, and the remaining rows of ACTION and GOTO are overlaid into flat arrays by row displacement: the entry
+    of a state for a symbol is at base[state] + symbol if check holds the state there.
+    """
+
+    def __init__(self,
+                 terminals: list[str],
+                 nonterminals: list[str],
+                 rule_lefts: list[int],
+                 rule_lengths: list[int],
+                 action_base: list[int],
+                 action_default: list[int],
+                 action_check: list[int],
+                 action_table: list[int],
+                 goto_base: list[int],
+                 goto_check: list[int],
+                 goto_table: list[int]):
+        self.terminals = terminals
+        self.nonterminals = nonterminals
+        self.terminal_ids = {name: i for i, name in enumerate(terminals)}
+        self.nonterminal_ids = {name: i for i, name in enumerate(nonterminals)}
+        self.rule_lefts = array.array('i', rule_lefts)
+        self.rule_lengths = array.array('i', rule_lengths)
+        self.action_base = array.array('i', action_base)
+        self.action_default = array.array('i', action_default)
+        self.action_check = array.array('i', action_check)
+        self.action_table = array.array('i', action_table)
+        self.goto_base = array.array('i', goto_base)
+        self.goto_check = array.array('i', goto_check)
+        self.goto_table = array.array('i', goto_table)
+
+    @classmethod
+    def from_parse_table(cls, parse_table: ParseTable) -> Self:
+        analysis = parse_table.analysis
+        terminals = [terminal.name for terminal in analysis.terminals]
+        nonterminals = sorted(symbol.name for symbol in parse_table.symbol_pool.get_nonterminals())
+        nonterminal_ids = {name: i for i, name in enumerate(nonterminals)}
+        action_rows, action_default, goto_rows = [], [], []
+        for state_id in range(len(parse_table.states)):
+            action_row, goto_row = {}, {}
+            for symbol, transition in parse_table.transitions[state_id].items():
+                if transition.type == Transition.TYPE_GOTO:
+                    goto_row[nonterminal_ids[symbol.name]] = transition.target
+                elif transition.type == Transition.TYPE_SHIFT:
+                    action_row[analysis.terminal_id_map[symbol]] = transition.target << 2 | transition.type
+                else:
+                    action_row[analysis.terminal_id_map[symbol]] = transition.target.id << 2 | transition.type
+            reduce_counts = collections.Counter(
+                code for code in action_row.values() if code & 3 == Transition.TYPE_REDUCE
+            )
+            default = 0
+            if reduce_counts:
+                default = min(reduce_counts, key=lambda x: (-reduce_counts[x], x))
+                action_row = {terminal_id: code for terminal_id, code in action_row.items() if code != default}
+                # Errors declared by nonassoc must not be swallowed by the default reduction.
+                for symbol in parse_table.errors.get(state_id, ()):
+                    action_row[analysis.terminal_id_map[symbol]] = 0
+            action_rows.append(action_row)
+            action_default.append(default)
+            goto_rows.append(goto_row)
+        action_base, action_check, action_table = _displace(action_rows, len(terminals))
+        goto_base, goto_check, goto_table = _displace(goto_rows, len(nonterminals))
+        return cls(
+            terminals,
+            nonterminals,
+            [nonterminal_ids[rule.left.name] for rule in analysis.rules],
+            [0 if rule.right[0] == analysis.null_symbol else len(rule.right) for rule in analysis.rules],
+            action_base,
+            action_default,
+            action_check,
+            action_table,
+            goto_base,
+            goto_check,
+            goto_table,
+        )
+
+    def get_action(self, state: int, terminal_id: int) -> int:
+        i = self.action_base[state] + terminal_id
+        if self.action_check[i] == state:
+            return self.action_table[i]
+        return self.action_default[state]
+
+    def get_goto(self, state: int, nonterminal_id: int) -> int:
+        i = self.goto_base[state] + nonterminal_id
+        if self.goto_check[i] == state:
+            return self.goto_table[i]
+        return -1
+
+    def __len__(self) -> int:
+        return len(self.action_base)
+
+
+def _displace(rows: list[dict[int, int]], width: int) -> tuple[list[int], list[int], list[int]]:
+    """
+    Overlays sparse rows into one array, first fit with the densest rows first. The arrays are padded so that every
+    base plus every column is a valid index.
+    """
+    base = [0] * len(rows)
+    check = [-1] * width
+    table = [0] * width
+    # Bit i of occupied is set if entry i is taken, which tests a whole row against an offset at once.
+    occupied = 0
+    next_offsets = {}
+    for row_id in sorted(range(len(rows)), key=lambda x: -len(rows[x])):
+        row = rows[row_id]
+        if not row:
+            continue
+        mask = 0
+        for column in row:
+            mask |= 1 << column
+        # Entries are never freed, so offsets that failed for an earlier row with the same columns fail again, and
+        # every entry below the lowest free one is taken.
+        offset = max(((occupied + 1) & ~occupied).bit_length() - 1 - min(row), next_offsets.get(mask, 0), 0)
+        while (occupied >> offset) & mask:
+            offset += 1
+        occupied |= mask << offset
+        next_offsets[mask] = offset + 1
+        if offset + width > len(check):
+            check.extend([-1] * (offset + width - len(check)))
+            table.extend([0] * (offset + width - len(table)))
+        for column, code in row.items():
+            check[offset + column] = row_id
+            table[offset + column] = code
+        base[row_id] = offset
+    return base, check, table
 
 
 class Grammar:
@@ -228,17 +637,19 @@ class Grammar:
     NULL_SYMBOL_NAME = 'null'
     END_SYMBOL_NAME = '$'
 
-    def __init__(self, config: dict[str, Any]):
+    def __init__(self, config: dict[str, Any], cache_dir: pathlib.Path | str | None = None):
         self._config = config
+        self._cache_dir = None if cache_dir is None else pathlib.Path(cache_dir)
         self._start_symbol = None
         self._rules = None
+        self.analysis = None
         self.parse_table = None
         self.symbol_pool = SymbolPool(
             set(config['terminal_symbols'] or {}),
             set(config['nonterminal_symbols'] or []),
         )
 
-    def init(self, rules: list[ProductionRule] | None = None):
+    def init(self, rules: list[ProductionRule] | None = None, mode: str = ParseTable.MODE_LR1):
         self._start_symbol = self.symbol_pool.get_nonterminal(self._config['start_symbol'])
         if rules is None:
             self._start_symbol, self._rules = self._augment()
@@ -247,43 +658,43 @@ class Grammar:
         for rule_id, rule in enumerate(self._rules):
             rule.id = rule_id
             rule.left.rules.append(rule)
-        self._compute_nullable()
-        self._compute_first()
-        self.parse_table = ParseTable(
-            config=self._config,
-            symbol_pool=self.symbol_pool,
-            start_symbol=self._start_symbol,
-        )
+        self.analysis = GrammarAnalysis(self._rules, self.symbol_pool, self._start_symbol)
+        null_symbol = self.symbol_pool.get_terminal(Grammar.NULL_SYMBOL_NAME)
+        for symbol in self.symbol_pool.get_nonterminals():
+            symbol.nullable = self.analysis.is_nullable(symbol)
+            symbol.first = self.analysis.to_symbols(self.analysis.first[symbol])
+            if symbol.nullable:
+                symbol.first.add(null_symbol)
+        options = {
+            'config': self._config,
+            'symbol_pool': self.symbol_pool,
+            'start_symbol': self._start_symbol,
+            'analysis': self.analysis,
+            'mode': mode,
+        }
+        if self._cache_dir is None:
+            self.parse_table = ParseTable(**options)
+            return
+        # State numbering only depends on the grammar, so the same key always names the same table.
+        key = hashlib.sha256(json.dumps([
+            ParseTable.VERSION,
+            sorted(symbol.name for symbol in self.symbol_pool.get_terminals()),
+            sorted(symbol.name for symbol in self.symbol_pool.get_nonterminals()),
+            self._start_symbol.name,
+            [[str(rule), rule.precedence] for rule in self._rules],
+            self._config.get('precedence'),
+            mode,
+        ]).encode()).hexdigest()
+        path = self._cache_dir / f'grammar-{key}.json'
+        self.parse_table = ParseTable.load(path, **options)
+        if self.parse_table is None:
+            self.parse_table = ParseTable(**options)
+            # A cache directory that cannot be written, such as a read-only shared one, only costs a rebuild.
+            with contextlib.suppress(OSError):
+                self.parse_table.save(path)
 
     def _augment(self) -> tuple[Nonterminal, list[ProductionRule]]:
         augmented_start_symbol = self.symbol_pool.get_nonterminal(Grammar.START_SYMBOL_NAME)
         rules = [ProductionRule.from_string(rule, self.symbol_pool) for rule in self._config['production_rules']]
         rules.insert(0, ProductionRule(augmented_start_symbol, [self._start_symbol]))
         return augmented_start_symbol, rules
-
-    def _compute_nullable(self):
-        nullable = {self.symbol_pool.get_terminal(Grammar.NULL_SYMBOL_NAME)}
-        while True:
-            nullable_size = len(nullable)
-            for rule in self._rules:
-                if all(symbol in nullable for symbol in rule.right):
-                    nullable.add(rule.left)
-                    rule.left.nullable = True
-            if len(nullable) == nullable_size:
-                break
-
-    def _compute_first(self):
-        null_symbol = self.symbol_pool.get_terminal(Grammar.NULL_SYMBOL_NAME)
-        while True:
-            first_size = sum(len(symbol.first) for symbol in self.symbol_pool.get_symbols())
-            for rule in self._rules:
-                add_null = True
-                for symbol in rule.right:
-                    rule.left.first |= symbol.first - {null_symbol}
-                    if null_symbol not in symbol.first:
-                        add_null = False
-                        break
-                if add_null:
-                    rule.left.first.add(null_symbol)
-            if sum(len(symbol.first) for symbol in self.symbol_pool.get_symbols()) == first_size:
-                break
@@ -1,5 +1,8 @@
+from typing import Any, Callable, Iterable
+
 from ptree.symbol.symbol import Token
-from ptree.parser.grammar import Grammar, Transition
+from ptree.symbol.pool import SymbolPool
+from ptree.parser.grammar import Grammar, ProductionRule, Transition, CompiledParseTable
 
 
 class ParseTree:
@@ -8,50 +11,167 @@ class ParseTree:
         self.token = token
         self.children = children or []
 
+    def __reduce__(self) -> tuple:
+        # Trees of long lists are deep, so they are pickled as a flat preorder list to stay clear of the recursion
+        # limit.
+        tokens, sizes = [], []
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            tokens.append(node.token)
+            sizes.append(len(node.children))
+            stack.extend(reversed(node.children))
+        return ParseTree._from_preorder, (tokens, sizes)
+
+    @staticmethod
+    def _from_preorder(tokens: list[Token], sizes: list[int]) -> 'ParseTree':
+        stack = []
+        for token, size in zip(reversed(tokens), reversed(sizes)):
+            stack.append(ParseTree(token, [stack.pop() for _ in range(size)]))
+        return stack[0]
+
 
 class Parser:
+    """
+    Builds parse trees by default. Given handlers keyed by rule string, it runs a syntax-directed translation instead:
+    each reduction calls handler(nodes, children) with the values and the tokens of the right side, and its result
+    becomes the value of the left side. Terminals are valued by their text, and rules without a handler fall back to
+    ProductionRule.handler and then to the value of their first symbol.
+    """
+
+    def __init__(self, grammar: Grammar, handlers: dict[str, Callable] | None = None):
+        # Only what parsing needs is kept, so that a pickled parser does not carry the LR automaton.
+        self._symbol_pool = grammar.symbol_pool
+        self._rules = grammar.analysis.rules
+        self._table = grammar.parse_table.compile()
+        self._handlers = None
+        if handlers is not None:
+            handler_map = {}
+            for rule_str, handler in handlers.items():
+                rule = ProductionRule.from_string(rule_str, grammar.symbol_pool)
+                if rule not in grammar.analysis.rules:
+                    raise ValueError(f'rule {rule} is not in the grammar')
+                handler_map[str(rule)] = handler
+            self._handlers = [
+                handler_map.get(str(rule), rule.handler) or _default_handler for rule in grammar.analysis.rules
+            ]
+
+    def push(self) -> 'PushParser':
+        return PushParser(self._symbol_pool, self._rules, self._table, self._handlers)
+
+    def parse(self, tokens: Iterable[Token]) -> ParseTree | Any:
+        push_parser = self.push()
+        for token in tokens:
+            push_parser.feed(token)
+        return push_parser.finish()
 
-    def __init__(self, grammar: Grammar):
-        self._grammar = grammar
 
-    def parse(self, tokens: list[Token]) -> ParseTree:
-        parse_table = self._grammar.parse_table
-        state_stack = [0]
-        node_stack = []
-        i = 0
+def _default_handler(nodes: list, _) -> Any:
+    return nodes[0]
+
+
+class PushParser:
+    """
+    Parses tokens as they arrive. The LR stacks are kept between calls to feed, so tokens can come from a generator
+    and never have to be held in a list.
+    """
+
+    def __init__(self,
+                 symbol_pool: SymbolPool,
+                 rules: list[ProductionRule],
+                 table: CompiledParseTable,
+                 handlers: list[Callable] | None = None):
+        self._symbol_pool = symbol_pool
+        self._rules = rules
+        self._table = table
+        self._handlers = handlers
+        self._end_token = Token(
+            value=Grammar.END_SYMBOL_NAME,
+            symbol=symbol_pool.get_terminal(Grammar.END_SYMBOL_NAME),
+        )
+        self._null_token = Token(value='', symbol=symbol_pool.get_terminal(Grammar.NULL_SYMBOL_NAME))
+        # Translations pass nonterminals to handlers as tokens without a position, so one per symbol is enough.
+        self._nonterminal_tokens = [Token(value=rule.left.name, symbol=rule.left) for rule in rules]
+        self._state_stack = [0]
+        self._node_stack = []
+        self._token_stack = []
+        self._index = 0
+        self._finished = False
+        self._result = None
+
+    def feed(self, token: Token):
+        """
+        Applies the reductions the token calls for and then shifts it.
+        """
+        if self._finished:
+            raise ValueError('cannot feed a finished parser')
+        table = self._table
+        handlers = self._handlers
+        action_base, action_default, action_check, action_table = \
+            table.action_base, table.action_default, table.action_check, table.action_table
+        state_stack, node_stack, token_stack = self._state_stack, self._node_stack, self._token_stack
+        terminal_id = table.terminal_ids.get(token.symbol.name)
         while True:
             state = state_stack[-1]
-            if i < len(tokens):
-                token = tokens[i]
-            else:
-                token = Token(
-                    value=Grammar.END_SYMBOL_NAME,
-                    symbol=self._grammar.symbol_pool.get_terminal(Grammar.END_SYMBOL_NAME),
-                )
-            transition = parse_table.transitions[state].get(token.symbol, None)
-            if transition is None:
-                raise ValueError(f'unexpected token {token.symbol.name}: {token.value} at index {i}')
-            if transition.type == Transition.TYPE_SHIFT:
-                state_stack.append(transition.target)
-                node_stack.append(ParseTree(token))
-                i += 1
-            elif transition.type == Transition.TYPE_GOTO:
-                state_stack.append(transition.target)
-                i += 1
-            elif transition.type == Transition.TYPE_REDUCE:
-                rule = transition.target
-                rule_length = len(rule.right)
-                children, node_stack = node_stack[-rule_length:], node_stack[:-rule_length]
-                node = ParseTree(token=Token(value=rule.left.name, symbol=rule.left), children=children)
-                node_stack.append(node)
-                state_stack = state_stack[:-rule_length]
-                i -= 1
-                tokens[i] = node.token
+            code = 0
+            if terminal_id is not None:
+                index = action_base[state] + terminal_id
+                code = action_table[index] if action_check[index] == state else action_default[state]
+            transition_type = code & 3
+            if transition_type == Transition.TYPE_SHIFT:
+                state_stack.append(code >> 2)
+                if handlers is None:
+                    node_stack.append(ParseTree(token))
+                else:
+                    node_stack.append(token.value)
+                    token_stack.append(token)
+                self._index += 1
+                return
+            elif transition_type == Transition.TYPE_REDUCE:
+                rule_id = code >> 2
+                rule_length = table.rule_lengths[rule_id]
+                # Stacks shrink in place, so a reduction costs as much as its rule is long.
+                if handlers is None:
+                    if rule_length:
+                        children = node_stack[-rule_length:]
+                        del node_stack[-rule_length:]
+                        del state_stack[-rule_length:]
+                    else:
+                        children = [ParseTree(self._null_token)]
+                    left = self._rules[rule_id].left
+                    node_stack.append(ParseTree(Token(value=left.name, symbol=left), children))
+                else:
+                    if rule_length:
+                        nodes, children = node_stack[-rule_length:], token_stack[-rule_length:]
+                        del node_stack[-rule_length:]
+                        del token_stack[-rule_length:]
+                        del state_stack[-rule_length:]
+                    else:
+                        nodes, children = [self._null_token.value], [self._null_token]
+                    node_stack.append(handlers[rule_id](nodes, children))
+                    token_stack.append(self._nonterminal_tokens[rule_id])
+                state_stack.append(table.goto_table[table.goto_base[state_stack[-1]] + table.rule_lefts[rule_id]])
+            elif transition_type == Transition.TYPE_ACCEPT:
+                rule_id = code >> 2
+                if handlers is None:
+                    self._result = ParseTree(
+                        token=Token(
+                            value=Grammar.START_SYMBOL_NAME,
+                            symbol=self._symbol_pool.get_nonterminal(Grammar.START_SYMBOL_NAME),
+                        ),
+                        children=node_stack,
+                    )
+                else:
+                    self._result = handlers[rule_id](node_stack, token_stack)
+                self._finished = True
+                return
             else:
-                return ParseTree(
-                    token=Token(
-                        value=Grammar.START_SYMBOL_NAME,
-                        symbol=self._grammar.symbol_pool.get_nonterminal(Grammar.START_SYMBOL_NAME)
-                    ),
-                    children=node_stack,
-                )
+                raise ValueError(f'unexpected token {token.symbol.name}: {token.value} at index {self._index}')
+
+    def finish(self) -> ParseTree | Any:
+        """
+        Ends the input and returns the parse tree, or the value of the start symbol in a translation.
+        """
+        if not self._finished:
+            self.feed(self._end_token)
+        return self._result
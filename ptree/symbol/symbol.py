@@ -18,6 +18,10 @@ class Symbol:
     def __hash__(self) -> int:
         return hash((self.name, self.type))
 
+    def __reduce__(self) -> tuple:
+        # The name has to be restored before the first set, which holds symbols hashed by name, possibly this one.
+        return self.__class__, (self.name,), self.__dict__
+
     def __str__(self) -> str:
         return self.name
 
@@ -56,9 +60,17 @@ class Nonterminal(Symbol):
 
 class Token:
 
-    def __init__(self, value: str, symbol: Symbol):
+    def __init__(self,
+                 value: str,
+                 symbol: Symbol,
+                 start: int | None = None,
+                 end: int | None = None,
+                 stop: int | None = None):
         self.value = value
         self.symbol = symbol
+        self.start = start
+        self.end = end
+        self.stop = stop
 
     def __eq__(self, other: 'Token') -> bool:
         if isinstance(other, Token):
@@ -5,7 +5,7 @@ from typing import Any
 
 from ptree.symbol.symbol import Token
 from ptree.lexer.fsm import NFA
-from ptree.parser.grammar import Transition, ParseTable, Grammar
+from ptree.parser.grammar import Transition, ParseTable, CompiledParseTable, Grammar
 from ptree.parser.parser import ParseTree
 
 
@@ -46,7 +46,7 @@ def pprint(obj):
             ],
             ['', *terminals, *nonterminals, ''],
         ]
-        for state, state_id in obj.state_id_map.items():
+        for state_id, state in enumerate(obj.states):
             row = [state_id]
             for name in terminals + nonterminals:
                 symbol = obj.symbol_pool.get_symbol(name)
@@ -67,6 +67,47 @@ def pprint(obj):
         action_span = [[0, i + 1] for i in range(len(terminals))]
         goto_span = [[0, i + 1] for i in range(len(terminals), len(terminals) + len(nonterminals))]
         print(data2rst(table, spans=[action_span, goto_span]))
+    elif isinstance(obj, CompiledParseTable):
+        terminals = [name for name in obj.terminals if name != Grammar.NULL_SYMBOL_NAME]
+        nonterminals = [name for name in obj.nonterminals if name != Grammar.START_SYMBOL_NAME]
+        table = [
+            [
+                '',
+                'ACTION',
+                *['' for _ in range(len(terminals) - 1)],
+                'GOTO',
+                *['' for _ in range(len(nonterminals) - 1)],
+                'DEFAULT',
+            ],
+            ['', *terminals, *nonterminals, ''],
+        ]
+        for state_id in range(len(obj)):
+            row = [state_id]
+            # Only entries stored for this state are shown, since every other one falls back to the default column.
+            for name in terminals:
+                i = obj.action_base[state_id] + obj.terminal_ids[name]
+                if obj.action_check[i] != state_id:
+                    row.append('')
+                    continue
+                code = obj.action_table[i]
+                match code & 3:
+                    case Transition.TYPE_SHIFT:
+                        row.append(f's{code >> 2}')
+                    case Transition.TYPE_REDUCE:
+                        row.append(f'r{code >> 2}')
+                    case Transition.TYPE_ACCEPT:
+                        row.append('acc')
+                    case _:
+                        row.append('err')
+            for name in nonterminals:
+                target = obj.get_goto(state_id, obj.nonterminal_ids[name])
+                row.append(str(target) if target >= 0 else '')
+            default = obj.action_default[state_id]
+            row.append(f'r{default >> 2}' if default else '')
+            table.append(row)
+        action_span = [[0, i + 1] for i in range(len(terminals))]
+        goto_span = [[0, i + 1] for i in range(len(terminals), len(terminals) + len(nonterminals))]
+        print(data2rst(table, spans=[action_span, goto_span]))
     else:
         print(obj)
 
@@ -104,7 +145,7 @@ def render(obj,
                     dot.edge(
                         str(state_id_map[state]),
                         str(state_id_map[target]),
-                        label=escaper(on) if on != NFA.EPSILON else 'ε',
+                        label=escaper(str(on)) if on != NFA.EPSILON else 'ε',
                     )
         dot.node('0', shape='point')
         dot.edge('0', str(state_id_map[obj.start]), label='start')
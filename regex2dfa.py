@@ -1,3 +1,5 @@
+import itertools
+
 import fire
 
 import ptree
@@ -5,14 +7,26 @@ import ptree
 from ptree.lexer.regex import Regex, RegexEngine
 
 
-def match(pattern: str, text: str) -> int | None:
+def match(pattern: str,
+          text: str | None = None,
+          file: str | None = None) -> tuple[str, int] | None | list[tuple[str, int] | None]:
     regex = Regex(pattern, pattern)
-    engine = RegexEngine()
+    engine = RegexEngine.shared()
     nfa = engine.parse(regex)
     ptree.render(nfa, directory='out', name='nfa', output_format='svg')
     dfa = nfa.to_dfa()
-    ptree.render(ptree, directory='out', name='dfa', output_format='svg')
-    return dfa.match(text)
+    state_count, minimized_state_count = dfa.minimize()
+    print(f'DFA states: {state_count} -> {minimized_state_count} after minimization')
+    ptree.render(dfa, directory='out', name='dfa', output_format='svg')
+    if file is None:
+        return dfa.match(text)
+
+    # Bulk mode: match every line of the file at once. The lines are passed as one buffer with offsets, so that a
+    # long line does not pad all the others.
+    with open(file, encoding='utf-8') as f:
+        lines = f.read().splitlines()
+    accepts, lengths = dfa.compile().match_many(''.join(lines), [0, *itertools.accumulate(map(len, lines))])
+    return [None if accept is None else (accept, length) for accept, length in zip(accepts, lengths.tolist())]
 
 
 if __name__ == '__main__':
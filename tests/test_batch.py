@@ -0,0 +1,48 @@
+import pickle
+import unittest
+
+import ptree
+
+from ptree.batch import parse_many
+
+
+class TestBatch(unittest.TestCase):
+
+    def _flatten(self, parse_tree):
+        nodes = []
+        stack = [parse_tree]
+        while stack:
+            node = stack.pop()
+            nodes.append((node.token.symbol.name, node.token.value, len(node.children)))
+            stack.extend(node.children)
+        return nodes
+
+    def test_parse_many(self):
+        config = ptree.load_config('configs/test-parser-test-equation.yaml')
+        grammar = ptree.Grammar(config)
+        grammar.init()
+        lexer = ptree.Lexer(config, symbol_pool=grammar.symbol_pool)
+        parser = ptree.Parser(grammar)
+        documents = [f'{i}*({i}+{i % 7})-{i}/3' for i in range(200)] + ['+'.join(['1'] * 2000)]
+        expected = [self._flatten(parser.parse(lexer.tokenize(document))) for document in documents]
+        for start_method in ['fork', 'spawn']:
+            parse_trees = parse_many(config, documents, workers=2, chunk_size=16, start_method=start_method)
+            self.assertEqual(expected, [self._flatten(parse_tree) for parse_tree in parse_trees])
+        results = sorted(parse_many(config, documents, workers=2, ordered=False), key=lambda x: x[0])
+        self.assertEqual(expected, [self._flatten(parse_tree) for _, parse_tree in results])
+        # Workers get the compiled table, not the LR automaton it was compiled from.
+        self.assertNotIn(b'ParseState', pickle.dumps(parser))
+
+    def test_errors(self):
+        config = ptree.load_config('configs/test-parser-test-equation.yaml')
+        documents = ['1+2', '1+', '3*4', '1 ? 2', '5']
+        with self.assertRaisesRegex(ValueError, 'document 1'):
+            list(parse_many(config, documents, workers=2, chunk_size=1))
+        results = list(parse_many(config, documents, workers=2, chunk_size=1, errors='return'))
+        self.assertEqual([False, True, False, True, False], [isinstance(result, ValueError) for result in results])
+        results = dict(parse_many(config, documents, workers=2, chunk_size=1, ordered=False, errors='return'))
+        self.assertEqual([1, 3], sorted(index for index, result in results.items() if isinstance(result, ValueError)))
+        self.assertEqual(
+            self._flatten(results[4]),
+            self._flatten(list(parse_many(config, ['5'], workers=1))[0]),
+        )
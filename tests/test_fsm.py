@@ -1,8 +1,11 @@
+import pickle
 import unittest
+import itertools
 
 import ptree
 
-from ptree.lexer.fsm import FSMState, NFA
+from ptree.lexer.fsm import FSMState, NFA, LazyDFA
+from ptree.lexer import regex as regex_module
 from ptree.lexer.regex import Regex, RegexEngine
 
 
@@ -99,6 +102,122 @@ class TestFSM(unittest.TestCase):
         ptree.render(dfa, directory='out', name='test-parse-regex-dfa', output_format='svg')
         self.assertEqual(('a+[bcd]ef*[g-j]k+', 5), dfa.match('acehkd'))
 
+    def test_regex_parse_table(self):
+        self.assertEqual(regex_module._PARSE_TABLE, RegexEngine().compute_parse_table())
+
+    def test_regex_cache(self):
+        engine = RegexEngine(cache_size=2)
+        nfa_0 = engine.compile(Regex('NUMBER', '[0-9]+'))
+        nfa_1 = engine.compile(Regex('INTEGER', '[0-9]+'))
+        self.assertEqual(1, len(engine._cache))
+        self.assertEqual(('NUMBER', 3), nfa_0.to_dfa().match('123'))
+        self.assertEqual(('INTEGER', 3), nfa_1.to_dfa().match('123'))
+        engine.compile(Regex('WORD', '[a-z]+'))
+        engine.compile(Regex('SPACE', ' +'))
+        self.assertEqual(['[a-z]+', ' +'], list(engine._cache))
+        self.assertIs(RegexEngine.shared(), RegexEngine.shared())
+
+    def test_char_set(self):
+        engine = RegexEngine()
+        for pattern, edge_count in [('.', 1), ('[a-z0-9_]', 1), ('[^a-z\\*/]', 1), ('a|b', 2)]:
+            nfa = engine.parse(Regex(pattern, pattern))
+            self.assertEqual(edge_count, sum(
+                len(targets)
+                for state in nfa.start.dfs()
+                for on, targets in state.transitions.items()
+                if on != NFA.EPSILON
+            ))
+        dfa = engine.parse(Regex('[^*/]+', '[^\\*/]+')).to_dfa()
+        self.assertEqual(('[^*/]+', 3), dfa.match('aé😀*/'))
+        self.assertEqual(None, dfa.match('/'))
+        self.assertEqual(('[^*/]+', 1), dfa.match('a\nb'))
+        dfa = engine.parse(Regex('.', '.')).to_dfa()
+        self.assertEqual(('.', 1), dfa.compile().match('\U0010ffff'))
+
+    def test_subset_construction(self):
+        pattern = '(a|b)*a(a|b)(a|b)(a|b)(a|b)(a|b)(a|b)(a|b)'
+        regex = Regex(pattern, pattern)
+        engine = RegexEngine()
+        dfa = engine.parse(regex).to_dfa()
+        self.assertEqual((257, 256), dfa.minimize())
+        self.assertEqual((pattern, 10), dfa.match('bbabbbbbbb'))
+        self.assertEqual(None, dfa.match('bbbabbbbb'))
+
+    def test_lazy_dfa(self):
+        pattern = '(a|b)*a(a|b)(a|b)(a|b)(a|b)(a|b)(a|b)(a|b)'
+        regex = Regex(pattern, pattern)
+        engine = RegexEngine()
+        nfa = engine.parse(regex)
+        dfa = nfa.to_dfa()
+        lazy_dfa = nfa.to_dfa(lazy=True)
+        self.assertEqual(0, lazy_dfa.flush_count)
+        texts = ['bbabbbbbbb', 'bbbabbbbb', 'ab' * 20, 'ba' * 40 + 'c', '']
+        for text in texts:
+            self.assertEqual(dfa.match(text), lazy_dfa.match(text))
+        self.assertLessEqual(len(lazy_dfa), 257)
+        small_dfa = LazyDFA(nfa.start, cache_size=4)
+        for text in texts * 10:
+            self.assertEqual(dfa.match(text), small_dfa.match(text))
+            self.assertLessEqual(len(small_dfa), 4)
+        self.assertEqual(LazyDFA.MAX_FLUSHES, small_dfa.flush_count)
+
+    def test_minimize(self):
+        pattern = '(a|b)*abb'
+        regex = Regex(pattern, pattern)
+        engine = RegexEngine()
+        dfa = engine.parse(regex).to_dfa()
+        state_count, minimized_state_count = dfa.minimize()
+        ptree.render(dfa, directory='out', name='test-minimize-dfa', output_format='svg')
+        self.assertLess(minimized_state_count, state_count)
+        self.assertEqual(4, minimized_state_count)
+        self.assertEqual(4, len(dfa.start.dfs()))
+        self.assertEqual(None, dfa.match('abab'))
+        self.assertEqual(('(a|b)*abb', 12), dfa.match('abbbababbabb'))
+        self.assertEqual(('(a|b)*abb', 4), dfa.match('aabbefg'))
+
+    def test_compiled_dfa(self):
+        pattern = '(a|b)*abb|[0-9]+'
+        regex = Regex(pattern, pattern)
+        engine = RegexEngine()
+        dfa = engine.parse(regex).to_dfa()
+        compiled_dfa = dfa.compile()
+        self.assertEqual(len(dfa.start.dfs()), len(compiled_dfa))
+        for text in ['abdsffgabb', 'abab', 'abbbababbabb', 'aabbefg', '0123abb', '', 'é']:
+            self.assertEqual(dfa.match(text), compiled_dfa.match(text))
+
+    def test_match_many(self):
+        import numpy as np
+        pattern = '(a|b)*abb|[0-9]+|[α-ω]+'
+        regex = Regex(pattern, pattern)
+        engine = RegexEngine()
+        dfa = engine.parse(regex).to_dfa()
+        texts = ['abdsffgabb', 'abab', 'abbbababbabb', 'aabbefg', '0123abb', '', 'é', 'αβγ1']
+        expected = [dfa.match(text) for text in texts]
+        accepts, lengths = dfa.match_many(texts)
+        self.assertEqual(expected, [None if a is None else (a, n) for a, n in zip(accepts, lengths.tolist())])
+        codes = np.zeros((len(texts), max(map(len, texts))), dtype=np.int32)
+        for i, text in enumerate(texts):
+            codes[i, :len(text)] = list(map(ord, text))
+        accepts, lengths = dfa.compile().match_many(codes)
+        self.assertEqual(expected, [None if a is None else (a, n) for a, n in zip(accepts, lengths.tolist())])
+        compiled = dfa.compile()
+        offsets = [0, *itertools.accumulate(map(len, texts))]
+        for buffer in [''.join(texts), [ord(c) for text in texts for c in text]]:
+            accepts, lengths = compiled.match_many(buffer, offsets)
+            self.assertEqual(expected, [None if a is None else (a, n) for a, n in zip(accepts, lengths.tolist())])
+        self.assertEqual(([None], [0]), (lambda a, n: (a, n.tolist()))(*compiled.match_many('abb', [1, 1])))
+        self.assertIn('_arrays', compiled.__dict__)
+        self.assertNotIn('_arrays', pickle.loads(pickle.dumps(compiled)).__dict__)
+        for offsets in [[], [2, 1], [0, 4], [[0, 1]], [0.0, 1.0]]:
+            with self.assertRaises(ValueError):
+                compiled.match_many('abb', offsets)
+        for compiled in [dfa, dfa.compile()]:
+            accepts, lengths = compiled.match_many([])
+            self.assertEqual(([], (0,), np.int64), (accepts, lengths.shape, lengths.dtype))
+        for bad in ['abb', [[[1]]], codes.astype(np.float64), np.array([[-1]]), np.array([[0x110000]])]:
+            with self.assertRaises(ValueError):
+                dfa.compile().match_many(bad)
+
 
 if __name__ == '__main__':
     unittest.main()
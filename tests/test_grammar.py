@@ -1,8 +1,12 @@
+import io
+import pathlib
+import tempfile
 import unittest
+import contextlib
 
 import ptree
 
-from ptree.parser.grammar import Grammar
+from ptree.parser.grammar import Grammar, ParseTable, Transition
 
 
 class TestGrammar(unittest.TestCase):
@@ -32,12 +36,157 @@ class TestGrammar(unittest.TestCase):
         for symbol in grammar.symbol_pool.get_nonterminals():
             self.assertEqual(symbol.first, first_set[symbol.name])
 
+    def test_follow_set(self):
+        config = ptree.load_config('configs/test-grammar-test-first-set.yaml')
+        grammar = Grammar(config)
+        grammar.init()
+        follow_set = {
+            'A': {'$', 'f'},
+            'B': {'$', 'a', 'c', 'd', 'f', 'g'},
+            'C': {'c', 'd', 'g'},
+            'D': {'$', 'a', 'b', 'c', 'f', 'g'},
+            'E': {'$', 'a', 'c', 'd', 'f', 'g'},
+            '_S': {'$'},
+        }
+        for symbol in grammar.symbol_pool.get_nonterminals():
+            follow = grammar.analysis.to_symbols(grammar.analysis.follow[symbol])
+            self.assertEqual({terminal.name for terminal in follow}, follow_set[symbol.name])
+
     def test_parse_table(self):
         config = ptree.load_config('configs/test-grammar-test-parse-table.yaml')
         grammar = Grammar(config)
         grammar.init()
         ptree.pprint(grammar.parse_table)
 
+    def test_modes(self):
+        config = ptree.load_config('configs/test-grammar-test-modes.yaml')
+        texts = ['acd', 'bcd', 'ace', 'bce', 'ccdcd']
+        state_counts = {}
+        for mode in [ParseTable.MODE_LR1, ParseTable.MODE_LALR1, ParseTable.MODE_PAGER]:
+            grammar = Grammar(config)
+            grammar.init(mode=mode)
+            state_counts[mode] = len(grammar.parse_table)
+            lexer = ptree.Lexer(config, symbol_pool=grammar.symbol_pool)
+            parser = ptree.Parser(grammar)
+            results = []
+            for text in texts:
+                try:
+                    parser.parse(lexer.tokenize(text))
+                    results.append(True)
+                except ValueError:
+                    results.append(False)
+            # Merging the two states after c in LALR(1) mode leads to a reduce-reduce conflict on d and e.
+            self.assertEqual(mode != ParseTable.MODE_LALR1, all(results))
+        self.assertGreater(state_counts[ParseTable.MODE_LR1], state_counts[ParseTable.MODE_PAGER])
+        self.assertGreater(state_counts[ParseTable.MODE_PAGER], state_counts[ParseTable.MODE_LALR1])
+
+    def test_self_merge(self):
+        # Some states of this grammar merge into themselves while their transitions are being built.
+        config = ptree.load_config('configs/test-grammar-test-self-merge.yaml')
+        state_counts = {}
+        for mode in [ParseTable.MODE_LR1, ParseTable.MODE_LALR1, ParseTable.MODE_PAGER]:
+            grammar = Grammar(config)
+            grammar.init(mode=mode)
+            state_counts[mode] = len(grammar.parse_table)
+        self.assertGreaterEqual(state_counts[ParseTable.MODE_LR1], state_counts[ParseTable.MODE_PAGER])
+        self.assertGreaterEqual(state_counts[ParseTable.MODE_PAGER], state_counts[ParseTable.MODE_LALR1])
+
+    def test_cache(self):
+        config = ptree.load_config('configs/test-grammar-test-modes.yaml')
+        with tempfile.TemporaryDirectory() as cache_dir:
+            grammar = Grammar(config, cache_dir=cache_dir)
+            grammar.init(mode=ParseTable.MODE_LALR1)
+            self.assertTrue(grammar.parse_table.conflicts)
+            cached_grammar = Grammar(config, cache_dir=cache_dir)
+            cached_grammar.init(mode=ParseTable.MODE_LALR1)
+            self.assertFalse(cached_grammar.parse_table._state_id_map)
+            path, = pathlib.Path(cache_dir).iterdir()
+            data = path.read_bytes()
+            for damaged in [data[:len(data) // 2], b'', b'garbage', b'{}', b'[]', data.replace(b'"', b"'", 1)]:
+                path.write_bytes(damaged)
+                rebuilt_grammar = Grammar(config, cache_dir=cache_dir)
+                rebuilt_grammar.init(mode=ParseTable.MODE_LALR1)
+                self.assertTrue(rebuilt_grammar.parse_table._state_id_map)
+                self.assertEqual(data, path.read_bytes())
+            # A cache that cannot be written is skipped, and no temporary file is left behind.
+            path.unlink()
+            path.mkdir()
+            unwritable_grammar = Grammar(config, cache_dir=cache_dir)
+            unwritable_grammar.init(mode=ParseTable.MODE_LALR1)
+            self.assertTrue(unwritable_grammar.parse_table.states)
+            self.assertEqual([path], list(pathlib.Path(cache_dir).iterdir()))
+            unwritable_grammar = Grammar(config, cache_dir=path / 'cache')
+            (path / 'cache').write_text('')
+            unwritable_grammar.init(mode=ParseTable.MODE_LALR1)
+            self.assertTrue(unwritable_grammar.parse_table.states)
+        self.assertEqual(
+            [str(state) for state in grammar.parse_table.states],
+            [str(state) for state in cached_grammar.parse_table.states],
+        )
+        self.assertEqual(
+            [sorted(map(str, transitions.values())) for transitions in grammar.parse_table.transitions.values()],
+            [sorted(map(str, transitions.values())) for transitions in cached_grammar.parse_table.transitions.values()],
+        )
+        self.assertEqual(
+            list(map(str, grammar.parse_table.conflicts)),
+            list(map(str, cached_grammar.parse_table.conflicts)),
+        )
+        lexer = ptree.Lexer(config, symbol_pool=cached_grammar.symbol_pool)
+        parse_tree = ptree.Parser(cached_grammar).parse(lexer.tokenize('ccdcd'))
+        self.assertEqual(['C', 'C'], [child.token.symbol.name for child in parse_tree.children[0].children])
+
+    def test_compile(self):
+        config = ptree.load_config('configs/test-parser-test-precedence.yaml')
+        grammar = Grammar(config)
+        grammar.init()
+        parse_table = grammar.parse_table
+        compiled_table = parse_table.compile()
+        self.assertEqual(len(parse_table), len(compiled_table))
+        for state_id, transitions in parse_table.transitions.items():
+            default = compiled_table.action_default[state_id]
+            for name, terminal_id in compiled_table.terminal_ids.items():
+                transition = transitions.get(grammar.symbol_pool.get_terminal(name))
+                code = compiled_table.get_action(state_id, terminal_id)
+                if transition is None:
+                    # Only a default reduction may fill in a missing entry, and never an error declared by nonassoc.
+                    self.assertIn(code, {0, default})
+                    if grammar.symbol_pool.get_terminal(name) in parse_table.errors[state_id]:
+                        self.assertEqual(0, code)
+                elif transition.type == Transition.TYPE_SHIFT:
+                    self.assertEqual(transition.target << 2 | Transition.TYPE_SHIFT, code)
+                else:
+                    self.assertEqual(transition.target.id << 2 | transition.type, code)
+            for name, nonterminal_id in compiled_table.nonterminal_ids.items():
+                transition = transitions.get(grammar.symbol_pool.get_nonterminal(name))
+                target = -1 if transition is None else transition.target
+                self.assertEqual(target, compiled_table.get_goto(state_id, nonterminal_id))
+        # The printed table shows stored entries only, and the default reduction once per state in its own column.
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            ptree.pprint(compiled_table)
+        rows = {}
+        for line in output.getvalue().splitlines():
+            cells = [cell.strip() for cell in line.strip('|').split('|')]
+            if line.startswith('|') and cells[0].isdigit():
+                rows[int(cells[0])] = cells
+        terminals = [name for name in compiled_table.terminals if name != Grammar.NULL_SYMBOL_NAME]
+        for state_id, transitions in parse_table.transitions.items():
+            default = compiled_table.action_default[state_id]
+            expected = []
+            for name in terminals:
+                symbol = grammar.symbol_pool.get_terminal(name)
+                transition = transitions.get(symbol)
+                if transition is None:
+                    expected.append('err' if default and symbol in parse_table.errors[state_id] else '')
+                elif transition.type == Transition.TYPE_SHIFT:
+                    expected.append(f's{transition.target}')
+                elif transition.target.id << 2 | transition.type == default:
+                    expected.append('')
+                else:
+                    expected.append('acc' if transition.type == Transition.TYPE_ACCEPT else f'r{transition.target.id}')
+            self.assertEqual(expected, rows[state_id][1:len(terminals) + 1])
+            self.assertEqual(f'r{default >> 2}' if default else '', rows[state_id][-1])
+
 
 if __name__ == '__main__':
     unittest.main()
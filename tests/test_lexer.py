@@ -1,8 +1,18 @@
+import io
+import mmap
+import pickle
+import pathlib
+import random
+import importlib.util
+import tempfile
 import unittest
 
 import ptree
 
 from ptree.symbol.symbol import Token
+from ptree.lexer.fsm import NFA
+from ptree.lexer.regex import Regex, RegexEngine, RegexSet
+from ptree.lexer.codegen import generate_source
 
 
 class TestLexer(unittest.TestCase):
@@ -48,3 +58,237 @@ class TestLexer(unittest.TestCase):
             Token('}', grammar.symbol_pool.get_terminal('RB')),
         ]
         self.assertEqual(ground_truth, tokens)
+
+    def test_offsets(self):
+        config = ptree.load_config('configs/test-lexer-test-ab.yaml')
+        grammar = ptree.Grammar(config)
+        lexer = ptree.Lexer(config, symbol_pool=grammar.symbol_pool)
+        text = 'aabaabc abaab'
+        tokens = lexer.tokenize(text)
+        self.assertEqual([(1, 3), (4, 7), (8, 10), (11, 13)], [(token.start, token.end) for token in tokens])
+        for token in tokens:
+            self.assertEqual(token.value, text[token.start:token.end])
+        self.assertEqual(tokens[1:], list(lexer.iter_tokens(text, start=3)))
+        with self.assertRaises(ValueError):
+            lexer.tokenize('abx')
+
+    def test_unicode(self):
+        config = ptree.load_config('configs/test-lexer-test-unicode.yaml')
+        grammar = ptree.Grammar(config)
+        tokens = [
+            Token('αβγ', grammar.symbol_pool.get_terminal('GREEK')),
+            Token('café', grammar.symbol_pool.get_terminal('WORD')),
+            Token('42', grammar.symbol_pool.get_terminal('NUMBER')),
+            Token('naïve😀', grammar.symbol_pool.get_terminal('WORD')),
+            Token('ω', grammar.symbol_pool.get_terminal('GREEK')),
+        ]
+        for backend in [ptree.Lexer.BACKEND_DFA, ptree.Lexer.BACKEND_COMPILED, ptree.Lexer.BACKEND_LAZY]:
+            lexer = ptree.Lexer(config, symbol_pool=grammar.symbol_pool, backend=backend)
+            self.assertEqual(tokens, lexer.tokenize('αβγ café 42\nnaïve😀ω'))
+
+    def test_stream(self):
+        config = ptree.load_config('configs/test-lexer-test-cpp.yaml')
+        grammar = ptree.Grammar(config)
+        lexer = ptree.Lexer(config, symbol_pool=grammar.symbol_pool)
+        text = '''int main() {float b = 1.5; /* comment */ return a >= b || !a;} // done\n''' * 20
+        tokens = lexer.tokenize(text)
+        for chunk_size in [1, 3, 64]:
+            stream_tokens = list(lexer.iter_stream(io.StringIO(text), chunk_size=chunk_size))
+            self.assertEqual(tokens, stream_tokens)
+            self.assertEqual([token.start for token in tokens], [token.start for token in stream_tokens])
+            self.assertEqual(tokens, list(lexer.iter_stream(io.BytesIO(text.encode()), chunk_size=chunk_size)))
+        with tempfile.TemporaryFile() as f:
+            f.write(text.encode())
+            f.flush()
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+                self.assertEqual(tokens, list(lexer.iter_stream(m, chunk_size=7)))
+
+    def test_cache(self):
+        config = ptree.load_config('configs/test-lexer-test-cpp.yaml')
+        grammar = ptree.Grammar(config)
+        text = '''int main() {float b = 1.5; /* comment */ return a >= b || !a;} // done'''
+        with tempfile.TemporaryDirectory() as cache_dir:
+            lexer = ptree.Lexer(config, symbol_pool=grammar.symbol_pool, cache_dir=cache_dir)
+            tokens = lexer.tokenize(text)
+            self.assertIn('_dfa', lexer.__dict__)
+            lexer = ptree.Lexer(config, symbol_pool=grammar.symbol_pool, cache_dir=cache_dir)
+            self.assertEqual(tokens, lexer.tokenize(text))
+            self.assertNotIn('_dfa', lexer.__dict__)
+            # A damaged cache file is rebuilt and replaced.
+            path, = pathlib.Path(cache_dir).iterdir()
+            data = path.read_bytes()
+            for damaged in [data[:len(data) // 2], data[:10], b'', b'\x80\x04garbage\n', b'{"version": 2}\n']:
+                path.write_bytes(damaged)
+                lexer = ptree.Lexer(config, symbol_pool=grammar.symbol_pool, cache_dir=cache_dir)
+                self.assertEqual(tokens, lexer.tokenize(text))
+                self.assertIn('_dfa', lexer.__dict__)
+                self.assertEqual(data, path.read_bytes())
+            # A cache that cannot be written is skipped, and no temporary file is left behind.
+            path.unlink()
+            path.mkdir()
+            lexer = ptree.Lexer(config, symbol_pool=grammar.symbol_pool, cache_dir=cache_dir)
+            self.assertEqual(tokens, lexer.tokenize(text))
+            self.assertEqual([path], list(pathlib.Path(cache_dir).iterdir()))
+            (path / 'cache').write_text('')
+            lexer = ptree.Lexer(config, symbol_pool=grammar.symbol_pool, cache_dir=path / 'cache')
+            self.assertEqual(tokens, lexer.tokenize(text))
+
+    def test_tokenize_stream(self):
+        config = ptree.load_config('configs/test-lexer-test-cpp.yaml')
+        grammar = ptree.Grammar(config)
+        lexer = ptree.Lexer(config, symbol_pool=grammar.symbol_pool)
+        text = '''int main() {float b = 1.5; /* comment */ return a >= b || !a;} // done'''
+        tokens = lexer.tokenize(text)
+        token_stream = lexer.tokenize_stream(text)
+        self.assertEqual(len(tokens), len(token_stream))
+        self.assertEqual(
+            [(token.value, token.symbol, token.start, token.end) for token in tokens],
+            [(token.value, token.symbol, token.start, token.end) for token in token_stream],
+        )
+        self.assertEqual(tokens[-1], token_stream[-1])
+        self.assertEqual(tokens[2:5], token_stream[2:5])
+
+    def test_generate_source(self):
+        config = ptree.load_config('configs/test-lexer-test-cpp.yaml')
+        grammar = ptree.Grammar(config)
+        lexer = ptree.Lexer(config, symbol_pool=grammar.symbol_pool)
+        text = '''int main() {float b = 1.5; /* comment */ return a >= b || !a;} // done'''
+        with tempfile.TemporaryDirectory() as directory:
+            path = pathlib.Path(directory) / 'cpp_lexer.py'
+            path.write_text(generate_source(lexer), encoding='utf-8')
+            spec = importlib.util.spec_from_file_location('cpp_lexer', path)
+            module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(module)
+        self.assertEqual(
+            [(token.value, token.symbol.name, token.start, token.end) for token in lexer.tokenize(text)],
+            [(token.value, token.symbol.name, token.start, token.end) for token in module.tokenize(text)],
+        )
+        with self.assertRaises(ValueError):
+            module.tokenize('int a = `')
+
+    def test_backends(self):
+        config = ptree.load_config('configs/test-lexer-test-cpp.yaml')
+        grammar = ptree.Grammar(config)
+        text = '''int main() {float b = 1.5; /* comment */ return a >= b || !a;} // done'''
+        lexer = ptree.Lexer(config, symbol_pool=grammar.symbol_pool, backend=ptree.Lexer.BACKEND_DFA)
+        tokens = lexer.tokenize(text)
+        for backend in [ptree.Lexer.BACKEND_COMPILED, ptree.Lexer.BACKEND_LAZY, ptree.Lexer.BACKEND_RE]:
+            lexer = ptree.Lexer(config, symbol_pool=grammar.symbol_pool, backend=backend)
+            self.assertEqual(tokens, lexer.tokenize(text))
+
+    def test_pickle(self):
+        config = ptree.load_config('configs/test-lexer-test-cpp.yaml')
+        grammar = ptree.Grammar(config)
+        text = '''int main() {float b = 1.5; /* comment */ return a >= b || !a;} // done'''
+        for backend in [ptree.Lexer.BACKEND_DFA, ptree.Lexer.BACKEND_COMPILED, ptree.Lexer.BACKEND_LAZY,
+                        ptree.Lexer.BACKEND_RE]:
+            lexer = ptree.Lexer(config, symbol_pool=grammar.symbol_pool, backend=backend).build()
+            copy = pickle.loads(pickle.dumps(lexer))
+            self.assertEqual(lexer.tokenize(text), copy.tokenize(text))
+            self.assertEqual(lexer.tokenize(text), list(copy.iter_stream(io.StringIO(text))))
+            tokens, *changed = lexer.relex(text, lexer.tokenize(text), 5, 0, '')
+            copy_tokens, *copy_changed = copy.relex(text, lexer.tokenize(text), 5, 0, '')
+            self.assertEqual((list(tokens), changed), (list(copy_tokens), copy_changed))
+            self.assertNotIn('_nfa', copy.__dict__)
+            self.assertNotIn('_dfa', copy.__dict__)
+
+    def test_re_backend(self):
+        rng = random.Random(0)
+        for config_path, alphabet in [
+            ('configs/test-lexer-test-cpp.yaml', ['int', 'integer', '1', '.5', '>=', '<', '<<', '=', '!', '|', '||',
+                                                  '/', '*', '/*', '*/', '//', '\n', ' ', 'a', '_', '(', '{', '`']),
+            ('configs/test-lexer-test-unicode.yaml', ['α', 'ω', 'x', '7', ' ', '\t', 'éé']),
+            ('configs/test-lexer-test-ab.yaml', ['a', 'b', 'c', ' ']),
+        ]:
+            config = ptree.load_config(config_path)
+            grammar = ptree.Grammar(config)
+            dfa_lexer = ptree.Lexer(config, symbol_pool=grammar.symbol_pool, backend=ptree.Lexer.BACKEND_DFA)
+            re_lexer = ptree.Lexer(config, symbol_pool=grammar.symbol_pool, backend=ptree.Lexer.BACKEND_RE)
+            for _ in range(200):
+                text = ''.join(rng.choices(alphabet, k=rng.randrange(1, 16)))
+                try:
+                    expected = [
+                        (token.value, token.symbol, token.start, token.stop) for token in dfa_lexer.tokenize(text)
+                    ]
+                except ValueError as e:
+                    expected = str(e)
+                try:
+                    actual = [
+                        (token.value, token.symbol, token.start, token.stop) for token in re_lexer.tokenize(text)
+                    ]
+                except ValueError as e:
+                    actual = str(e)
+                self.assertEqual(expected, actual, text)
+
+        def generate(depth: int) -> str:
+            r = rng.random()
+            if depth > 2 or r < 0.35:
+                pattern = rng.choice(['a', 'b', 'c', '[ab]', '[bc]'])
+            elif r < 0.6:
+                pattern = generate(depth + 1) + generate(depth + 1)
+            else:
+                pattern = '(' + '|'.join(generate(depth + 1) for _ in range(rng.randint(1, 3))) + ')'
+            if rng.random() < 0.35:
+                pattern = (pattern if len(pattern) == 1 or pattern[-1] in ')]' else f'({pattern})') + rng.choice('*+')
+            return pattern
+
+        engine = RegexEngine.shared()
+        pattern_lists = [['a*(ab)*'], ['(ab)*(abc)*'], ['a+(ab)+|c'], ['[ab]*b(ba)*'], ['a*(ab)*', 'a+b', 'c']]
+        pattern_lists += [[generate(0) for _ in range(rng.randint(1, 3))] for _ in range(300)]
+        for patterns in pattern_lists:
+            regex_list = [Regex(f'T{i}', pattern) for i, pattern in enumerate(patterns)]
+            regex_set = RegexSet(regex_list)
+            dfa = NFA.union([engine.parse(regex) for regex in regex_list]).to_dfa(
+                priority=[regex.name for regex in regex_list],
+            )
+            dfa.minimize()
+            dfa = dfa.compile()
+            for _ in range(30):
+                text = ''.join(rng.choices('abc', k=rng.randint(1, 8)))
+                for start in range(len(text) + 1):
+                    self.assertEqual(dfa.scan(text, start), regex_set.scan(text, start), (patterns, text, start))
+        self.assertEqual(('T', 2), RegexSet([Regex('T', 'a*(ab)*')]).match('ab'))
+        self.assertEqual(('T', 3), RegexSet([Regex('T', 'a*(ab)*')]).match('aab'))
+        self.assertIsNone(RegexSet([Regex('T', 'a')]).match(''))
+        self.assertIsNone(RegexSet([Regex('T', 'a')]).match('a', 1))
+
+    def test_relex(self):
+        config = ptree.load_config('configs/test-lexer-test-cpp.yaml')
+        grammar = ptree.Grammar(config)
+        lexer = ptree.Lexer(config, symbol_pool=grammar.symbol_pool)
+        text = '''int main() {float b = 1.5; /* comment */ return a >= b || !a;} // done\nint c;'''
+        tokens = lexer.tokenize(text)
+        rng = random.Random(0)
+        for _ in range(200):
+            start = rng.randrange(len(text) + 1)
+            old_length = rng.randrange(min(4, len(text) - start) + 1)
+            new_text = ''.join(rng.choices(['a', '1', '.', ' ', '/', '*', '>', '=', '\n', 'int '], k=rng.randrange(3)))
+            new = text[:start] + new_text + text[start + old_length:]
+            try:
+                expected = lexer.tokenize(new)
+            except ValueError:
+                continue
+            old_tokens = list(tokens)
+            tokens, first, old_end, new_end = lexer.relex(new, tokens, start, old_length, new_text)
+            self.assertEqual(
+                [(token.value, token.symbol, token.start, token.end, token.stop) for token in expected],
+                [(token.value, token.symbol, token.start, token.end, token.stop) for token in tokens],
+            )
+            self.assertEqual(old_tokens[:first], tokens[:first])
+            self.assertEqual(old_tokens[old_end:], tokens[new_end:])
+            text = new
+        text = 'int a = b;\n' * 100
+        tokens = lexer.tokenize(text)
+        new_tokens, first, old_end, new_end = lexer.relex(text[:505] + 'x' + text[505:], tokens, 505, 0, 'x')
+        self.assertEqual((old_end, new_end), (first + 1, first + 2))
+        self.assertEqual([';', 'x'], [token.value for token in new_tokens[first:new_end]])
+        text = '1/i/*nt||**a*=* /'
+        new_tokens, *_ = lexer.relex(text[9:], lexer.tokenize(text), 0, 9, '')
+        self.assertEqual([1, 2, 3, 4, 5, 6, 8], [token.stop for token in new_tokens])
+        self.assertEqual([token.stop for token in lexer.tokenize(text[9:])], [token.stop for token in new_tokens])
+        text = 'int a = b;\n' * 500
+        for backend in [ptree.Lexer.BACKEND_COMPILED, ptree.Lexer.BACKEND_RE]:
+            lexer = ptree.Lexer(config, symbol_pool=grammar.symbol_pool, backend=backend)
+            tokens = lexer.tokenize(text)
+            _, first, old_end, new_end = lexer.relex(text[:-3] + 'x' + text[-3:], tokens, len(text) - 3, 0, 'x')
+            self.assertEqual((len(tokens) - 2, len(tokens) - 1, len(tokens) - 1), (first, old_end, new_end))
@@ -1,7 +1,10 @@
+import io
 import unittest
 
 import ptree
 
+from ptree.parser.grammar import Transition
+
 
 class TestParser(unittest.TestCase):
 
@@ -265,3 +268,196 @@ class TestParser(unittest.TestCase):
             """,
             dot_source
         )
+
+    def test_token_stream(self):
+        config = ptree.load_config('configs/test-parser-test-equation.yaml')
+        grammar = ptree.Grammar(config)
+        grammar.init()
+        lexer = ptree.Lexer(config, symbol_pool=grammar.symbol_pool)
+        parser = ptree.Parser(grammar)
+        text = '3*(6+(4/2)-5)+8'
+        tokens = lexer.tokenize(text)
+        parse_tree = parser.parse(tokens)
+        self.assertEqual(lexer.tokenize(text), tokens)
+        dot_source = ptree.render(parse_tree, directory='out', name='test-parser-test-token-stream-parse-tree')
+        self.assertEqual(
+            dot_source,
+            ptree.render(
+                parser.parse(lexer.tokenize_stream(text)),
+                directory='out',
+                name='test-parser-test-token-stream-parse-tree',
+            ),
+        )
+
+    def test_modes(self):
+        config = ptree.load_config('configs/test-parser-test-equation.yaml')
+        dot_sources = []
+        for mode in [ptree.ParseTable.MODE_LR1, ptree.ParseTable.MODE_LALR1, ptree.ParseTable.MODE_PAGER]:
+            grammar = ptree.Grammar(config)
+            grammar.init(mode=mode)
+            lexer = ptree.Lexer(config, symbol_pool=grammar.symbol_pool)
+            parser = ptree.Parser(grammar)
+            parse_tree = parser.parse(lexer.tokenize('3*(6+(4/2)-5)+8'))
+            dot_sources.append(ptree.render(parse_tree, directory='out', name='test-parser-test-modes-parse-tree'))
+        self.assertEqual(dot_sources[0], dot_sources[1])
+        self.assertEqual(dot_sources[0], dot_sources[2])
+
+    def _evaluate(self, node):
+        children = node.children
+        if len(children) == 1:
+            return int(children[0].token.value)
+        if children[0].token.value == '-':
+            return -self._evaluate(children[1])
+        if children[0].token.value == '(':
+            return self._evaluate(children[1])
+        left, right = self._evaluate(children[0]), self._evaluate(children[2])
+        match children[1].token.value:
+            case '<':
+                return left < right
+            case '+':
+                return left + right
+            case '-':
+                return left - right
+            case '*':
+                return left * right
+            case '/':
+                return left / right
+            case '^':
+                return left ** right
+
+    def test_precedence(self):
+        config = ptree.load_config('configs/test-parser-test-precedence.yaml')
+        grammar = ptree.Grammar(config)
+        grammar.init()
+        self.assertEqual([], grammar.parse_table.conflicts)
+        lexer = ptree.Lexer(config, symbol_pool=grammar.symbol_pool)
+        parser = ptree.Parser(grammar)
+        for text in ['1-2-3', '2^3^2', '-2^2', '2*-3+4', '8/4/2', '1+2*3-4/2', '(1+2)*3', '1+2<2*3', '-(2-5)*-2^-1']:
+            parse_tree = parser.parse(lexer.tokenize(text))
+            self.assertEqual(eval(text.replace('^', '**')), self._evaluate(parse_tree.children[0]), text)
+        with self.assertRaises(ValueError):
+            parser.parse(lexer.tokenize('1<2<3'))
+
+        # A second reduction on a lookahead that nonassoc made an error is still a reduce-reduce conflict.
+        nonassoc_config = {
+            **config,
+            'nonterminal_symbols': {'E': None, 'D': None},
+            'production_rules': config['production_rules'] + ['E -> D', 'D -> E < E'],
+        }
+        grammar = ptree.Grammar(nonassoc_config)
+        grammar.init()
+        self.assertIn(
+            ('<', [Transition.TYPE_REDUCE, Transition.TYPE_REDUCE]),
+            [
+                (conflict.symbol.name, [transition.type for transition in conflict.transitions])
+                for conflict in grammar.parse_table.conflicts
+            ],
+        )
+
+        del config['precedence']
+        config['production_rules'] = [rule.replace(' %prec NEG', '') for rule in config['production_rules']]
+        grammar = ptree.Grammar(config)
+        grammar.init()
+        self.assertTrue(grammar.parse_table.conflicts)
+
+    def test_null_rule(self):
+        config = ptree.load_config('configs/test-grammar-test-first-set.yaml')
+        grammar = ptree.Grammar(config)
+        grammar.init()
+        lexer = ptree.Lexer(config, symbol_pool=grammar.symbol_pool)
+        parser = ptree.Parser(grammar)
+        parse_tree = parser.parse(lexer.tokenize('ac'))
+        node = parse_tree.children[0]
+        self.assertEqual(['B', 'C', 'c'], [child.token.symbol.name for child in node.children])
+        self.assertEqual(['null'], [child.token.symbol.name for child in node.children[0].children])
+        self.assertEqual(['D', 'a', 'B'], [child.token.symbol.name for child in node.children[1].children])
+
+    def test_long_input(self):
+        config = ptree.load_config('configs/test-parser-test-precedence.yaml')
+        grammar = ptree.Grammar(config)
+        grammar.init()
+        lexer = ptree.Lexer(config, symbol_pool=grammar.symbol_pool)
+        parser = ptree.Parser(grammar)
+        # Right associative powers keep every operand on the stack until the end of the input.
+        tokens = lexer.tokenize('^'.join(['1'] * 100000))
+        expected_tokens = list(tokens)
+        parse_tree = parser.parse(tokens)
+        self.assertEqual(expected_tokens, tokens)
+        depth = 0
+        node = parse_tree.children[0]
+        while len(node.children) == 3:
+            node = node.children[2]
+            depth += 1
+        self.assertEqual(99999, depth)
+
+    def test_push_parser(self):
+        config = ptree.load_config('configs/test-parser-test-equation.yaml')
+        grammar = ptree.Grammar(config)
+        grammar.init()
+        lexer = ptree.Lexer(config, symbol_pool=grammar.symbol_pool)
+        parser = ptree.Parser(grammar)
+        text = '3*(6+(4/2)-5)+8'
+        push_parser = parser.push()
+        for token in lexer.iter_stream(io.BytesIO(text.encode()), chunk_size=4):
+            push_parser.feed(token)
+        parse_tree = push_parser.finish()
+        self.assertIs(parse_tree, push_parser.finish())
+        self.assertEqual(
+            ptree.render(
+                parser.parse(lexer.tokenize(text)),
+                directory='out',
+                name='test-parser-test-push-parser-parse-tree',
+            ),
+            ptree.render(parse_tree, directory='out', name='test-parser-test-push-parser-parse-tree'),
+        )
+        with self.assertRaises(ValueError):
+            push_parser.feed(lexer.tokenize('3')[0])
+
+        push_parser = parser.push()
+        for token in lexer.tokenize('3*(6'):
+            push_parser.feed(token)
+        with self.assertRaisesRegex(ValueError, 'at index 4'):
+            push_parser.finish()
+        push_parser = parser.push()
+        with self.assertRaisesRegex(ValueError, 'at index 1'):
+            for token in lexer.tokenize('3(6'):
+                push_parser.feed(token)
+
+    def test_translation(self):
+        config = ptree.load_config('configs/test-parser-test-precedence.yaml')
+        grammar = ptree.Grammar(config)
+        grammar.init()
+        lexer = ptree.Lexer(config, symbol_pool=grammar.symbol_pool)
+        parser = ptree.Parser(grammar, handlers={
+            'E -> E < E': lambda nodes, _: nodes[0] < nodes[2],
+            'E -> E + E': lambda nodes, _: nodes[0] + nodes[2],
+            'E -> E - E': lambda nodes, _: nodes[0] - nodes[2],
+            'E -> E * E': lambda nodes, _: nodes[0] * nodes[2],
+            'E -> E / E': lambda nodes, _: nodes[0] / nodes[2],
+            'E -> E ^ E': lambda nodes, _: nodes[0] ** nodes[2],
+            'E -> - E %prec NEG': lambda nodes, _: -nodes[1],
+            'E -> ( E )': lambda nodes, _: nodes[1],
+            'E -> num': lambda nodes, children: int(children[0].value),
+        })
+        tree_parser = ptree.Parser(grammar)
+        for text in ['1-2-3', '2^3^2', '-2^2', '2*-3+4', '8/4/2', '1+2*3-4/2', '(1+2)*3', '1+2<2*3', '-(2-5)*-2^-1']:
+            self.assertEqual(eval(text.replace('^', '**')), parser.parse(lexer.iter_tokens(text)), text)
+            parse_tree = tree_parser.parse(lexer.tokenize(text))
+            self.assertEqual(self._evaluate(parse_tree.children[0]), parser.parse(lexer.tokenize(text)))
+        with self.assertRaises(ValueError):
+            parser.parse(lexer.tokenize('1<2<3'))
+        with self.assertRaises(ValueError):
+            ptree.Parser(grammar, handlers={'E -> E E': lambda nodes, _: None})
+
+        config = ptree.load_config('configs/test-grammar-test-first-set.yaml')
+        grammar = ptree.Grammar(config)
+        grammar.init()
+        lexer = ptree.Lexer(config, symbol_pool=grammar.symbol_pool)
+        # Rules without a handler pass on the value of their first symbol, and null rules have an empty value.
+        parser = ptree.Parser(grammar, handlers={
+            'A -> B C c': lambda nodes, _: ''.join(nodes),
+            'C -> D a B': lambda nodes, _: ''.join(nodes),
+            'C -> c a': lambda nodes, _: ''.join(nodes),
+        })
+        self.assertEqual('ac', parser.parse(lexer.tokenize('ac')))
+        self.assertEqual('cac', parser.parse(lexer.tokenize('cac')))